@@ -1,35 +1,121 @@
 import asyncio
-from typing import List, Tuple
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple
 
 from clients.parallel_client import ParallelClient
 from core.config import Settings
+from core.deadline import CUTOFF, gather_until, time_left
+from core.metrics import SEMAPHORE_WAIT_SECONDS
+from core.minhash import near_duplicate_groups
+from core.text import coverage, token_set
+
+if TYPE_CHECKING:
+    # numpy is only needed once the index is opened, off the startup path
+    from core.semindex import SemanticIndex
+
+logger = logging.getLogger("explorer")
+
+PREFERRED_HOSTS = (".gov", ".edu", ".int", "arxiv.org", "w3.org", "acm.org", "ieee.org")
+
+# tasks bound themselves to the deadline; this is only the backstop for work that does not
+DEADLINE_GRACE_S = 0.5
+
+
+# how long a URL waits for other tasks' URLs to share its extract call
+EXTRACT_LINGER_S = 0.05
+
+
+class ExtractBatcher:
+    # Extracts for the tasks of one run. Each URL is extracted once however many tasks
+    # ask for it; URLs requested within EXTRACT_LINGER_S of each other (or a full
+    # extract_batch_size of them) share one call. A task waits only for the batches
+    # holding its own URLs, so tasks still finish, and report progress, one by one.
+    # Each URL resolves to its excerpts, [] if its batch failed, or CUTOFF.
+    def __init__(self, explorer: "ExplorerAgent", objective: str, stats: dict, until: float | None = None):
+        self.explorer = explorer
+        self.objective = objective
+        self.stats = stats
+        self.until = until
+        self.size = explorer.settings.extract_batch_size
+        self.futures: Dict[str, asyncio.Future] = {}
+        self.pending: List[str] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.calls: List[asyncio.Future] = []
+
+    def request(self, urls: List[str]) -> List[asyncio.Future]:
+        loop = asyncio.get_running_loop()
+        new = 0
+        for u in urls:
+            if u not in self.futures:
+                self.futures[u] = loop.create_future()
+                self.pending.append(u)
+                new += 1
+        self.explorer.count_extract_requests(self.stats, len(urls), new)
+        if len(self.pending) >= self.size:
+            self.flush()
+        elif self.pending and self.timer is None:
+            self.timer = loop.call_later(EXTRACT_LINGER_S, self.flush)
+        return [self.futures[u] for u in urls]
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        while self.pending:
+            batch, self.pending = self.pending[:self.size], self.pending[self.size:]
+            self.calls.append(asyncio.ensure_future(self._extract(batch)))
+
+    async def _extract(self, batch: List[str]):
+        excerpts = await self.explorer._extract_urls(batch, self.objective, self.stats, self.until)
+        for u in batch:
+            if not self.futures[u].done():
+                self.futures[u].set_result(CUTOFF if excerpts is CUTOFF else excerpts.get(u, []))
+
+    def close(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        for c in self.calls:
+            c.cancel()
 
 
 class ExplorerAgent:
-    def __init__(self, parallel_client: ParallelClient, settings: Settings):
+    def __init__(self, parallel_client: ParallelClient, settings: Settings, index: Optional["SemanticIndex"] = None):
         self.parallel = parallel_client
         self.settings = settings
+        self.index = index
+        # shared by every run on this controller, so it bounds upstream fan-out per worker
+        self.semaphore = asyncio.Semaphore(settings.parallel_max_concurrency)
+
+    @asynccontextmanager
+    async def slot(self, op: str):
+        # queueing for a slot is measured apart from the upstream call itself
+        t = time.perf_counter()
+        async with self.semaphore:
+            SEMAPHORE_WAIT_SECONDS.observe(time.perf_counter() - t, op=op)
+            yield
 
     def get_field(self, obj, name, default=None):
         if isinstance(obj, dict):
             return obj.get(name, default)
         return getattr(obj, name, default)
 
-    def search_and_extract(
+    async def search(
         self,
         task_text: str,
         agent_tag: str,
-        main_prompt: str,
         max_urls: int | None = None,
     ) -> Tuple[dict, list]:
         if max_urls is None:
             max_urls = self.settings.max_urls_per_task
 
-        search_results = self.parallel.search(
-            objective=task_text,
-            max_results=max_urls,
-            max_chars=self.settings.max_search_excerpt_chars,
-        )
+        async with self.slot("search"):
+            search_results = await self.parallel.search(
+                objective=task_text,
+                max_results=max_urls,
+                max_chars=self.settings.max_search_excerpt_chars,
+            )
 
         urls = []
         for r in search_results:
@@ -39,59 +125,420 @@ class ExplorerAgent:
 
         urls = urls[:max_urls]
         log_item = {"agent": agent_tag, "objective": task_text, "urls": urls}
+        return log_item, search_results
 
+    async def extract(
+        self,
+        urls: List[str],
+        main_prompt: str,
+        stats: dict | None = None,
+        until: float | None = None,
+    ) -> Dict[str, list]:
         if not urls:
-            return log_item, []
+            return {}
+        stats = stats if stats is not None else {}
+        size = self.settings.extract_batch_size
+        batches = [urls[i:i + size] for i in range(0, len(urls), size)]
+        excerpts_by_url = {}
+        for excerpts in await asyncio.gather(*(self._extract_urls(b, main_prompt, stats, until) for b in batches)):
+            if excerpts is not CUTOFF:
+                excerpts_by_url.update(excerpts)
+        return excerpts_by_url
 
-        extract_results = self.parallel.extract(
-            urls=urls,
-            objective=main_prompt,
-            max_chars=self.settings.max_extract_chars,
-        )
+    async def _extract_urls(
+        self,
+        urls: List[str],
+        objective: str,
+        stats: dict,
+        until: float | None = None,
+    ):
+        # One extract call: excerpts by URL, or CUTOFF if the deadline came first. A call
+        # that still fails after retries only costs its own URLs ({}), not the whole run.
+        async def call():
+            async with self.slot("extract"):
+                return await self.parallel.extract(
+                    urls=urls,
+                    objective=objective,
+                    max_chars=self.settings.max_extract_chars,
+                )
 
-        evidence = []
-        for r in extract_results:
+        try:
+            results = await asyncio.wait_for(call(), time_left(until))
+        except asyncio.TimeoutError:
+            stats["extract_cutoff_urls"] = stats.get("extract_cutoff_urls", 0) + len(urls)
+            return CUTOFF
+        except Exception as e:
+            logger.warning("Extract batch failed | urls=%d | error=%r", len(urls), e)
+            stats["extract_failed_urls"] = stats.get("extract_failed_urls", 0) + len(urls)
+            return {}
+        return {self.get_field(r, "url"): self.get_field(r, "excerpts", []) or [] for r in results}
+
+    def count_extract_requests(self, stats: dict, requested: int, unique: int):
+        stats["extract_urls_requested"] = stats.get("extract_urls_requested", 0) + requested
+        stats["extract_urls_unique"] = stats.get("extract_urls_unique", 0) + unique
+        stats["extract_urls_saved"] = stats.get("extract_urls_saved", 0) + requested - unique
+
+    def split_tiers(
+        self,
+        log_item: dict,
+        search_results: list,
+        main_prompt: str,
+        stats: dict,
+    ) -> Tuple[list, List[str]]:
+        # strong search excerpts become evidence directly; only thin/weak URLs get extracted
+        if not self.settings.tiered_evidence:
+            return [], log_item["urls"]
+
+        objective_terms = token_set(log_item["objective"])
+        prompt_terms = token_set(main_prompt)
+        evidence, to_extract = [], []
+        for r in search_results:
             url = self.get_field(r, "url")
-            excerpts = self.get_field(r, "excerpts", []) or []
-            for ex in excerpts:
+            if url not in log_item["urls"]:
+                continue
+            excerpts = [ex for ex in (self.get_field(r, "excerpts", []) or []) if ex]
+            text = " ".join(excerpts)
+            terms = token_set(text)
+            score = 0.5 * coverage(objective_terms, terms) + 0.5 * coverage(prompt_terms, terms)
+            if score >= self.settings.excerpt_min_score and len(text) >= self.settings.excerpt_min_chars:
+                for ex in excerpts:
+                    evidence.append({"agent": log_item["agent"], "url": url, "quote": ex, "tier": "search"})
+            elif len(to_extract) < self.settings.extract_top_k:
+                to_extract.append(url)
+
+        stats["excerpt_evidence"] = stats.get("excerpt_evidence", 0) + len(evidence)
+        stats["extract_skipped"] = stats.get("extract_skipped", 0) + len(log_item["urls"]) - len(to_extract)
+        return evidence, to_extract
+
+    def build_evidence(
+        self,
+        agent_tag: str,
+        urls: List[str],
+        excerpts_by_url: Dict[str, list],
+        evidence: list | None = None,
+    ) -> list:
+        evidence = list(evidence or [])[:self.settings.max_evidence_per_task]
+        if len(evidence) >= self.settings.max_evidence_per_task:
+            return evidence
+        for url in urls:
+            for ex in excerpts_by_url.get(url, []):
                 evidence.append({"agent": agent_tag, "url": url, "quote": ex})
                 if len(evidence) >= self.settings.max_evidence_per_task:
-                    return log_item, evidence
+                    return evidence
+        return evidence
 
-        return log_item, evidence
+    async def search_and_extract(
+        self,
+        task_text: str,
+        agent_tag: str,
+        main_prompt: str,
+        max_urls: int | None = None,
+        stats: dict | None = None,
+        until: float | None = None,
+        batcher: Optional["ExtractBatcher"] = None,
+    ) -> Tuple[dict, list]:
+        # with a batcher the extract goes through the run's shared batches, so a URL another
+        # task already asked for is not extracted twice
+        stats = stats if stats is not None else {}
+        try:
+            log_item, results = await asyncio.wait_for(
+                self.search(task_text, agent_tag, max_urls), time_left(until)
+            )
+        except asyncio.TimeoutError:
+            self.cut(stats, agent_tag, task_text, "search")
+            return {"agent": agent_tag, "objective": task_text, "urls": [], "cutoff": "search"}, []
+        except Exception as e:
+            logger.warning("Search failed | agent=%s | error=%r", agent_tag, e)
+            stats["failed_searches"] = stats.get("failed_searches", 0) + 1
+            return {"agent": agent_tag, "objective": task_text, "urls": []}, []
+
+        evidence, urls = self.split_tiers(log_item, results, main_prompt, stats)
+        if not urls or len(evidence) >= self.settings.max_evidence_per_task:
+            return log_item, evidence[:self.settings.max_evidence_per_task]
+
+        if batcher is not None:
+            results = await asyncio.gather(*batcher.request(urls))
+        else:
+            self.count_extract_requests(stats, len(urls), len(urls))
+            excerpts = await self._extract_urls(urls, main_prompt, stats, until)
+            results = [CUTOFF if excerpts is CUTOFF else excerpts.get(u, []) for u in urls]
+        missing = sum(1 for r in results if r is CUTOFF)
+        if missing:
+            # keep whatever the search tier already gave us
+            self.cut(stats, agent_tag, task_text, "extract", missing)
+            log_item["cutoff"] = "extract"
+        excerpts_by_url = {u: r for u, r in zip(urls, results) if isinstance(r, list)}
+        return log_item, self.build_evidence(agent_tag, urls, excerpts_by_url, evidence)
+
+    async def refresh(self, state: dict, previous: dict, max_age_s: float):
+        # Re-runs the previous run's searches, but only extracts URLs that are new or whose
+        # evidence is older than max_age_s; everything else is carried over. Evidence gets
+        # a fetched_at stamp so its age survives chained refreshes.
+        prompt = state["prompt"]
+        stats = state.setdefault("explore_stats", {})
+        now = time.time()
+        prev_at = previous.get("created_at") or 0
+
+        fresh: Dict[str, list] = {}
+        expired = 0
+        for e in previous.get("evidence", []) or []:
+            e = {**e, "fetched_at": e.get("fetched_at") or prev_at}
+            if now - e["fetched_at"] < max_age_s:
+                fresh.setdefault(e.get("url"), []).append(e)
+            else:
+                expired += 1
+
+        tasks = []
+        for t in state.get("tasks", []) or []:
+            objective = (t.get("task") or "").strip()
+            if objective:
+                tasks.append((objective, (t.get("tag") or "general").strip()))
+        prev_logs = {l.get("objective"): l for l in previous.get("search_log", []) or []}
+
+        searched = []
+        for (objective, tag), res in zip(tasks, await gather_until((self.search(o, t) for o, t in tasks), None)):
+            if isinstance(res, Exception):
+                # keep last time's URLs for this task: their fresh evidence still applies
+                logger.warning("Refresh search failed | agent=%s | error=%r", tag, res)
+                stats["failed_searches"] = stats.get("failed_searches", 0) + 1
+                log = prev_logs.get(objective) or {"agent": tag, "objective": objective, "urls": []}
+                res = ({**log, "urls": list(log.get("urls") or [])}, [])
+            searched.append(res)
+
+        plans = []
+        for log_item, results in searched:
+            search_ev, to_extract = self.split_tiers(log_item, results, prompt, stats)
+            reused = [e for u in log_item["urls"] if u in fresh for e in fresh[u]]
+            new_ev = [dict(e, fetched_at=now) for e in search_ev if e.get("url") not in fresh]
+            plans.append((log_item, reused + new_ev, [u for u in to_extract if u not in fresh]))
+
+        unique = list(dict.fromkeys(u for _, _, urls in plans for u in urls))
+        excerpts_by_url = await self.extract(unique, prompt, stats)
 
-    def dedup_evidence(self, state: dict):
         seen = set()
+        for log_item, evidence, urls in plans:
+            state["search_log"].append(log_item)
+            for e in self.build_evidence(log_item["agent"], urls, excerpts_by_url, evidence):
+                e.setdefault("fetched_at", now)
+                state["evidence"].append(e)
+            seen.update(log_item["urls"])
+        # still-fresh evidence from URLs the searches no longer return stays in the report
+        carried = [e for u, items in fresh.items() if u not in seen for e in items]
+        state["evidence"].extend(carried)
+
+        stats.update(
+            refresh_reused=sum(1 for e in state["evidence"] if e["fetched_at"] < now),
+            refresh_expired=expired,
+            refresh_carried=len(carried),
+            refresh_extracted_urls=len(unique),
+        )
+        await asyncio.to_thread(self.dedup_evidence, state)
+
+    def from_index(self, objective: str, agent_tag: str) -> Optional[Tuple[dict, list]]:
+        # A past task close enough to this one answers it from the local index: its
+        # evidence plus other indexed excerpts similar to the objective, all still fresh.
+        newer_than = time.time() - self.settings.semindex_max_age_s
+        tasks = self.index.search("task", objective, k=3, min_sim=self.settings.semindex_task_min_sim, newer_than=newer_than)
+        if not tasks:
+            return None
+        rows = self.index.task_evidence([row for row, _ in tasks], newer_than)
+        similar = self.index.search(
+            "evidence", objective, k=self.settings.semindex_top_k,
+            min_sim=self.settings.semindex_evidence_min_sim, newer_than=newer_than,
+        )
+        rows += self.index.rows("evidence", [row for row, _ in similar])
+
+        evidence, seen = [], set()
+        for r in rows:
+            if (r["url"], r["text"]) in seen:
+                continue
+            seen.add((r["url"], r["text"]))
+            evidence.append({"agent": agent_tag, "url": r["url"], "quote": r["text"], "tier": "index", "fetched_at": r["created_at"]})
+            if len(evidence) >= self.settings.max_evidence_per_task:
+                break
+        if not evidence:
+            return None
+        urls = list(dict.fromkeys(e["url"] for e in evidence))
+        return {"agent": agent_tag, "objective": objective, "urls": urls, "index_hit": round(tasks[0][1], 3)}, evidence
+
+    def cut(self, stats: dict, agent_tag: str, objective: str, stage: str, urls: int = 0):
+        item = {"agent": agent_tag, "objective": objective, "stage": stage}
+        if urls:
+            item["urls"] = urls
+        stats.setdefault("cutoff_tasks", []).append(item)
+
+    def dedup_evidence(self, state: dict):
+        seen = {}
         deduped = []
         for e in state["evidence"]:
             key = (e.get("url"), e.get("quote"))
-            if key in seen:
+            kept = seen.get(key)
+            if kept is None:
+                seen[key] = e
+                deduped.append(e)
                 continue
-            seen.add(key)
-            deduped.append(e)
+            # same excerpt found by another task: keep one copy, credit every tag
+            agents = kept.get("agents") or [kept.get("agent")]
+            if e.get("agent") not in agents:
+                kept["agents"] = agents + [e.get("agent")]
         state["evidence"] = deduped
 
-    async def run(self, state: dict):
+        if self.settings.near_dup_enabled:
+            self.dedup_near_duplicates(state)
+
+    def source_rank(self, e: dict):
+        url = (e.get("url") or "").lower()
+        host = url.split("://", 1)[-1].split("/", 1)[0]
+        preferred = host.endswith(PREFERRED_HOSTS)
+        return (preferred, e.get("tier") != "search", len(e.get("quote") or ""))
+
+    def dedup_near_duplicates(self, state: dict):
+        # syndicated copies of the same paragraph: keep the best-sourced one, keep the rest as citations
+        evidence = state["evidence"]
+        groups = near_duplicate_groups(
+            [e.get("quote") or "" for e in evidence],
+            self.settings.near_dup_threshold,
+            shingle_size=self.settings.near_dup_shingle_size,
+        )
+
+        merged = 0
+        out = []
+        for group in groups:
+            members = [evidence[i] for i in group]
+            if len(members) == 1:
+                out.append(members[0])
+                continue
+            best = max(members, key=self.source_rank)
+            agents = list(best.get("agents") or [best.get("agent")])
+            sources = list(best.get("also_sources") or [])
+            for m in members:
+                if m is best:
+                    continue
+                for a in (m.get("agents") or [m.get("agent")]):
+                    if a not in agents:
+                        agents.append(a)
+                for u in [m.get("url")] + list(m.get("also_sources") or []):
+                    if u and u != best.get("url") and u not in sources:
+                        sources.append(u)
+            if len(agents) > 1:
+                best["agents"] = agents
+            if sources:
+                best["also_sources"] = sources
+            merged += len(members) - 1
+            out.append(best)
+
+        state["evidence"] = out
+        stats = state.setdefault("explore_stats", {})
+        stats["near_duplicates_merged"] = stats.get("near_duplicates_merged", 0) + merged
+
+    def start(
+        self,
+        task_text: str,
+        agent_tag: str,
+        main_prompt: str,
+        stats: dict | None = None,
+        until: float | None = None,
+    ) -> asyncio.Future:
+        return asyncio.ensure_future(
+            self.search_and_extract(task_text, agent_tag, main_prompt, stats=stats, until=until)
+        )
+
+    async def run_iter(
+        self,
+        state: dict,
+        prefetched: Optional[Dict[int, asyncio.Future]] = None,
+        until: float | None = None,
+        tasks: Optional[List[dict]] = None,
+        use_cache: bool = True,
+    ) -> AsyncIterator[Tuple[dict, list]]:
+        # prefetched maps a task index to work that is already in flight for it;
+        # until is the monotonic time by which exploration must hand over what it has;
+        # tasks replaces the planned tasks (follow-up rounds), results still go to state;
+        # use_cache=False (no_cache requests) also bypasses the semantic index
         prompt = state["prompt"]
-        tasks = state.get("tasks", []) or []
+        if tasks is None:
+            tasks = state.get("tasks", []) or []
+        prefetched = prefetched or {}
+        stats = state.setdefault("explore_stats", {})
 
-        jobs = []
-        for t in tasks:
+        planned = []
+        for i, t in enumerate(tasks):
             objective = (t.get("task") or "").strip()
             tag = (t.get("tag") or "general").strip()
-            if not objective:
-                continue
-            jobs.append(asyncio.to_thread(self.search_and_extract, objective, tag, prompt))
+            if objective:
+                planned.append((i, objective, tag))
 
-        results = await asyncio.gather(*jobs)
+        # tasks the local index can answer never reach Parallel
+        indexed = {}
+        if self.index is not None and use_cache:
+            lookups = [(i, o, t) for i, o, t in planned if i not in prefetched]
+            for (i, _, _), hit in zip(lookups, await asyncio.gather(
+                *(asyncio.to_thread(self.from_index, o, t) for _, o, t in lookups)
+            )):
+                if hit is not None:
+                    indexed[i] = hit
+            stats["index_tasks"] = stats.get("index_tasks", 0) + len(indexed)
+            stats["index_evidence"] = stats.get("index_evidence", 0) + sum(len(ev) for _, ev in indexed.values())
 
-        for item in results:
-            if not item:
+        jobs = []
+        job_tasks = {}
+        batcher = ExtractBatcher(self, prompt, stats, until) if self.settings.batch_extract else None
+        for i, objective, tag in planned:
+            if i in indexed:
                 continue
-            log_item, ev = item
-            if log_item:
+            if i in prefetched:
+                job = prefetched[i]
+            else:
+                job = asyncio.ensure_future(
+                    self.search_and_extract(objective, tag, prompt, stats=stats, until=until, batcher=batcher)
+                )
+            jobs.append(job)
+            job_tasks[job] = (objective, tag)
+
+        # yield each task as soon as it finishes so callers can report progress
+        backstop = None if until is None else time_left(until) + DEADLINE_GRACE_S
+        try:
+            for log_item, ev in indexed.values():
                 state["search_log"].append(log_item)
-            if ev:
                 state["evidence"].extend(ev)
+                yield log_item, ev
+            for fut in asyncio.as_completed(jobs, timeout=backstop):
+                try:
+                    done = await fut
+                except asyncio.TimeoutError:
+                    for job in jobs:
+                        if not job.done():
+                            objective, tag = job_tasks[job]
+                            self.cut(stats, tag, objective, "explore")
+                    logger.warning("Explorer deadline reached | cutoff=%d", len(stats.get("cutoff_tasks", [])))
+                    break
+                except Exception as e:
+                    logger.warning("Explorer task failed | error=%r", e)
+                    stats["failed_tasks"] = stats.get("failed_tasks", 0) + 1
+                    continue
+                if not done:
+                    continue
+                log_item, ev = done
+                if log_item:
+                    state["search_log"].append(log_item)
+                if ev:
+                    state["evidence"].extend(ev)
+                yield log_item, ev
+        finally:
+            for j in jobs:
+                j.cancel()
+            if batcher is not None:
+                batcher.close()
 
-        self.dedup_evidence(state)
\ No newline at end of file
+        # MinHash over every excerpt: off the event loop so other requests keep streaming
+        await asyncio.to_thread(self.dedup_evidence, state)
+
+    async def run(
+        self,
+        state: dict,
+        prefetched: Optional[Dict[int, asyncio.Future]] = None,
+        until: float | None = None,
+        use_cache: bool = True,
+    ):
+        async for _ in self.run_iter(state, prefetched, until, use_cache=use_cache):
+            pass
@@ -1,3 +1,5 @@
+from typing import Iterator, List
+
 from core.config import Settings
 
 
@@ -5,36 +7,28 @@ class MarkdownAgent:
     def __init__(self, settings: Settings):
         self.settings = settings
 
-    def run(self, state: dict):
-        prompt = state["prompt"]
-        summary = state.get("summary_structured", {}) or {}
-
-        title = (summary.get("title") or prompt).strip()
-        exec_sum = (summary.get("main_summary") or "").strip()
-        insights = summary.get("key_insights") or []
-        sections = summary.get("sections") or []
-        tables = summary.get("tables") or []
-        claims = summary.get("claims") or []
+    def cite_urls(self, urls):
+        urls = [u for u in (urls or []) if u]
+        if not urls:
+            return ""
+        if len(urls) == 1:
+            return f"(Source: {urls[0]})"
+        return "(Sources: " + ", ".join(urls[:3]) + ")"
 
+    def references(self, state: dict, summary: dict) -> List[str]:
         refs = summary.get("references") or []
         refs = refs[: self.settings.max_refs]
         if not refs:
             seen = set()
             for e in (state.get("evidence", []) or []):
-                u = e.get("url")
-                if u and u not in seen:
-                    seen.add(u)
-                    refs.append(u)
+                for u in [e.get("url")] + list(e.get("also_sources") or []):
+                    if u and u not in seen:
+                        seen.add(u)
+                        refs.append(u)
             refs = refs[:40]
+        return refs
 
-        def cite_urls(urls):
-            urls = [u for u in (urls or []) if u]
-            if not urls:
-                return ""
-            if len(urls) == 1:
-                return f"(Source: {urls[0]})"
-            return "(Sources: " + ", ".join(urls[:3]) + ")"
-
+    def render_header(self, title: str, exec_sum: str) -> List[str]:
         md = []
         md.append(f"# {title}")
         md.append("")
@@ -42,73 +36,221 @@ class MarkdownAgent:
         md.append("")
         md.append(exec_sum if exec_sum else "No executive summary available.")
         md.append("")
+        return md
 
+    def render_insights(self, insights) -> List[str]:
+        md = []
         md.append("**Key Insights:**")
         md.append("")
         if insights:
             for it in insights[:self.settings.max_insights]:
                 ins = (it.get("insight") or "").strip()
-                src = cite_urls(it.get("sources"))
+                src = self.cite_urls(it.get("sources"))
                 if ins:
                     md.append(f"* **{ins}** {src}".rstrip())
         else:
             md.append("* Evidence was insufficient to extract clear strategic insights.")
         md.append("")
+        return md
 
-        if claims:
-            md.append("## Claims and Evidence")
+    def render_claim(self, c) -> List[str]:
+        md = []
+        claim = (c.get("claim") or "").strip()
+        evidence = c.get("evidence") or []
+        if claim:
+            md.append(f"**Claim:** {claim}")
+            for ev in evidence[:self.settings.max_claim_evidence]:
+                q = (ev.get("quote") or "").strip()
+                src = ev.get("source")
+                if q and src:
+                    md.append(f"> {q}")
+                    md.append(f"> *(Source: {src})*")
             md.append("")
-            for c in claims[:self.settings.max_claims]:
-                claim = (c.get("claim") or "").strip()
-                evidence = c.get("evidence") or []
-                if claim:
-                    md.append(f"**Claim:** {claim}")
-                    for ev in evidence[:self.settings.max_claim_evidence]:
-                        q = (ev.get("quote") or "").strip()
-                        src = ev.get("source")
-                        if q and src:
-                            md.append(f"> {q}")
-                            md.append(f"> *(Source: {src})*")
-                    md.append("")
-                    
-        for sec in sections[:self.settings.max_sections]:
-            heading = (sec.get("heading") or "").strip()
-            bullets = sec.get("bullets") or []
-            if not heading:
-                continue
-            md.append(f"## {heading}")
+        return md
+
+    def render_section(self, sec) -> List[str]:
+        md = []
+        heading = (sec.get("heading") or "").strip()
+        bullets = sec.get("bullets") or []
+        if not heading:
+            return md
+        md.append(f"## {heading}")
+        md.append("")
+        if bullets:
+            for b in bullets[:self.settings.max_section_bullets]:
+                pt = (b.get("point") or "").strip()
+                src = self.cite_urls(b.get("sources"))
+                if pt:
+                    md.append(f"* {pt} {src}".rstrip())
+        else:
+            md.append("* (No extracted points.)")
+        md.append("")
+        return md
+
+    def render_table(self, tb) -> List[str]:
+        md = []
+        ttitle = (tb.get("title") or "").strip()
+        cols = tb.get("columns") or []
+        rows = tb.get("rows") or []
+        src = self.cite_urls(tb.get("sources"))
+
+        if ttitle:
+            md.append(f"**Table: {ttitle}** {src}".rstrip())
             md.append("")
-            if bullets:
-                for b in bullets[:self.settings.max_section_bullets]:
-                    pt = (b.get("point") or "").strip()
-                    src = cite_urls(b.get("sources"))
-                    if pt:
-                        md.append(f"* {pt} {src}".rstrip())
-            else:
-                md.append("* (No extracted points.)")
+        if cols and rows:
+            md.append("| " + " | ".join(cols) + " |")
+            md.append("| " + " | ".join([":---"] * len(cols)) + " |")
+            for r in rows[:self.settings.max_table_rows]:
+                r = [("" if x is None else str(x)) for x in r]
+                r = (r + [""] * len(cols))[:len(cols)]
+                md.append("| " + " | ".join(r) + " |")
             md.append("")
+        return md
 
-        for tb in tables[:self.settings.max_tables]:
-            ttitle = (tb.get("title") or "").strip()
-            cols = tb.get("columns") or []
-            rows = tb.get("rows") or []
-            src = cite_urls(tb.get("sources"))
-
-            if ttitle:
-                md.append(f"**Table: {ttitle}** {src}".rstrip())
-                md.append("")
-            if cols and rows:
-                md.append("| " + " | ".join(cols) + " |")
-                md.append("| " + " | ".join([":---"] * len(cols)) + " |")
-                for r in rows[:self.settings.max_table_rows]:
-                    r = [("" if x is None else str(x)) for x in r]
-                    r = (r + [""] * len(cols))[:len(cols)]
-                    md.append("| " + " | ".join(r) + " |")
-                md.append("")
+    def render_cutoffs(self, state: dict) -> List[str]:
+        info = state.get("deadline") or {}
+        if not info.get("degraded"):
+            return []
+        md = ["## Coverage Note", ""]
+        md.append(f"This report was produced under a {info.get('budget_s'):g}s deadline, so it is based on partial results.")
+        md.append("")
+        if info.get("planner_cutoff"):
+            md.append("* Planning ran out of time; generic research angles were used.")
+        for t in info.get("cutoff_tasks") or []:
+            md.append(f"* Cut off during {t.get('stage')}: {t.get('objective')} ({t.get('agent')})")
+        if info.get("summary_truncated"):
+            md.append("* The summary was cut off before it was complete.")
+        md.append("")
+        return md
 
+    def render_references(self, refs) -> List[str]:
+        md = []
         md.append("## References")
         md.append("")
         for i, u in enumerate(refs, 1):
             md.append(f"{i}. {u}")
+        return md
+
+    def iter_blocks(self, state: dict) -> Iterator[str]:
+        # each block is a report section; joining them with "\n" gives the full report
+        prompt = state["prompt"]
+        summary = state.get("summary_structured", {}) or {}
+
+        title = (summary.get("title") or prompt).strip()
+        exec_sum = (summary.get("main_summary") or "").strip()
+        insights = summary.get("key_insights") or []
+        sections = summary.get("sections") or []
+        tables = summary.get("tables") or []
+        claims = summary.get("claims") or []
+
+        yield "\n".join(self.render_header(title, exec_sum))
+        yield "\n".join(self.render_insights(insights))
+
+        if claims:
+            md = ["## Claims and Evidence", ""]
+            for c in claims[:self.settings.max_claims]:
+                md.extend(self.render_claim(c))
+            yield "\n".join(md)
+
+        for sec in sections[:self.settings.max_sections]:
+            md = self.render_section(sec)
+            if md:
+                yield "\n".join(md)
+
+        for tb in tables[:self.settings.max_tables]:
+            md = self.render_table(tb)
+            if md:
+                yield "\n".join(md)
 
-        state["final_report"] = "\n".join(md).strip()
\ No newline at end of file
+        cutoffs = self.render_cutoffs(state)
+        if cutoffs:
+            yield "\n".join(cutoffs)
+
+        yield "\n".join(self.render_references(self.references(state, summary)))
+
+    def progressive(self, state: dict) -> "ProgressiveMarkdown":
+        return ProgressiveMarkdown(self, state)
+
+    def run_iter(self, state: dict) -> Iterator[str]:
+        blocks = []
+        for block in self.iter_blocks(state):
+            blocks.append(block)
+            yield block
+        state["final_report"] = "\n".join(blocks).strip()
+
+    def run(self, state: dict):
+        for _ in self.run_iter(state):
+            pass
+
+
+STAGES = ("header", "key_insights", "claims", "sections", "tables", "references")
+
+
+class ProgressiveMarkdown:
+    # Renders summarizer stream events (see SummarizerAgent.run_iter) into report
+    # lines as soon as they can be placed. Report order is fixed, so a piece that
+    # arrives after a later part has started is skipped here; MarkdownAgent.run over
+    # the final summary stays the canonical report.
+    def __init__(self, agent: MarkdownAgent, state: dict):
+        self.agent = agent
+        self.state = state
+        self.settings = agent.settings
+        self.stage = -1
+        self.title = ""
+        self.main_summary = ""
+        self.counts = {k: 0 for k in STAGES}
+
+    def feed(self, kind: str, key, value) -> List[str]:
+        if kind == "value" and key == "title" and isinstance(value, str):
+            self.title = value
+            return []
+        if kind == "value" and key == "main_summary" and isinstance(value, str):
+            self.main_summary = value
+            return self._advance(0)
+        if kind != "item" or key not in STAGES or key == "references":
+            return []
+
+        stage = STAGES.index(key)
+        if stage < self.stage or not isinstance(value, dict):
+            return []
+        md = self._advance(stage)
+        n = self.counts[key]
+        self.counts[key] = n + 1
+
+        if key == "key_insights":
+            if n == 0:
+                md.extend(["**Key Insights:**", ""])
+            if n < self.settings.max_insights:
+                md.extend(self.agent.render_insights([value])[2:-1])
+        elif key == "claims":
+            if n == 0:
+                md.extend(["## Claims and Evidence", ""])
+            if n < self.settings.max_claims:
+                md.extend(self.agent.render_claim(value))
+        elif key == "sections" and n < self.settings.max_sections:
+            md.extend(self.agent.render_section(value))
+        elif key == "tables" and n < self.settings.max_tables:
+            md.extend(self.agent.render_table(value))
+        return md
+
+    def finish(self) -> List[str]:
+        md = self._advance(STAGES.index("references"))
+        summary = self.state.get("summary_structured", {}) or {}
+        md.extend(self.agent.render_cutoffs(self.state))
+        md.extend(self.agent.render_references(self.agent.references(self.state, summary)))
+        return md
+
+    def _advance(self, stage: int) -> List[str]:
+        md = []
+        while self.stage < stage:
+            # close the stage we are leaving, then open the next one
+            if self.stage == STAGES.index("key_insights"):
+                if self.counts["key_insights"]:
+                    md.append("")
+                else:
+                    md.extend(self.agent.render_insights([]))
+            self.stage += 1
+            if self.stage == 0:
+                title = (self.title or self.state["prompt"]).strip()
+                md.extend(self.agent.render_header(title, self.main_summary.strip()))
+        return md
@@ -4,7 +4,15 @@ class PlannerAgent:
     def __init__(self, client):
         self.client = client
 
-    def run(self, state):
+    @staticmethod
+    def fallback_tasks(prompt):
+        return [
+            {"task": f"Academic angle: {prompt}", "tag": "research"},
+            {"task": f"Industry angle: {prompt}", "tag": "industry"},
+            {"task": f"General overview: {prompt}", "tag": "general"},
+        ]
+
+    async def run(self, state):
         prompt = state["prompt"]
         system = "You are a planner for a research agent."
         user = f"""
@@ -41,7 +49,7 @@ class PlannerAgent:
             Start with here is the plan and tasks
             """.strip()
 
-        text = self.client.complete(system=system, user=user)
+        text = await self.client.complete(system=system, user=user)
 
         try:
             data = json.loads(text)
@@ -49,8 +57,4 @@ class PlannerAgent:
             state["tasks"] = data.get("tasks", []) if isinstance(data.get("tasks"), list) else []
         except Exception:
             state["plan"] = [f"Research: {prompt}"]
-            state["tasks"] = [
-                {"task": f"Academic angle: {prompt}", "tag": "research"},
-                {"task": f"Industry angle: {prompt}", "tag": "industry"},
-                {"task": f"General overview: {prompt}", "tag": "general"},
-            ]
\ No newline at end of file
+            state["tasks"] = self.fallback_tasks(prompt)
\ No newline at end of file
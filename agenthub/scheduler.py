@@ -0,0 +1,202 @@
+import heapq
+import logging
+import math
+import time
+from collections import Counter
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from agenthub.explorer import ExplorerAgent
+from core.config import Settings
+from core.deadline import time_left
+from core.metrics import SCHEDULER_FOLLOWUPS, SCHEDULER_STOPS
+from core.text import token_set
+
+logger = logging.getLogger("scheduler")
+
+# the planner is asked for both angles, so a plan that lacks one still leaves a gap
+EXPECTED_TAGS = ("research", "industry")
+TAG_ANGLES = {"research": "Academic research", "industry": "Industry practice", "general": "General overview"}
+
+# (score, kind, objective, tag); higher scores are explored first
+Gap = Tuple[float, str, str, str]
+
+
+def host(url) -> str:
+    return (url or "").lower().split("://", 1)[-1].split("/", 1)[0]
+
+
+class ExplorationScheduler:
+    # Iterative deepening over the explorer. Round 1 runs the planned tasks; after each
+    # round the evidence is scored for coverage gaps (tags with few excerpts, objectives
+    # and prompt terms backed by a single site) and the worst gaps are explored as
+    # follow-up objectives. Deepening stops at the round, search or latency budget, when
+    # no gaps are left, or when a round adds too little new evidence to be worth another.
+    def __init__(self, explorer: ExplorerAgent, settings: Settings):
+        self.explorer = explorer
+        self.settings = settings
+
+    def sources(self, evidence: List[dict]) -> Set[str]:
+        return {host(u) for e in evidence for u in [e.get("url")] + list(e.get("also_sources") or []) if u}
+
+    def searches(self, state: dict) -> int:
+        # Parallel searches spent so far; index hits and searches cut before they ran are free
+        return sum(
+            1 for l in state.get("search_log", []) or []
+            if not l.get("index_hit") and l.get("cutoff") != "search"
+        )
+
+    def gaps(self, state: dict) -> List[Gap]:
+        s = self.settings
+        prompt = state["prompt"]
+        evidence = state.get("evidence", []) or []
+        out: List[Gap] = []
+
+        per_tag = Counter(a for e in evidence for a in (e.get("agents") or [e.get("agent")]))
+        planned = [(t.get("tag") or "general").strip() for t in state.get("tasks", []) or []]
+        for tag in dict.fromkeys(planned + list(EXPECTED_TAGS)):
+            n = per_tag.get(tag, 0)
+            if n < s.scheduler_min_tag_evidence:
+                angle = TAG_ANGLES.get(tag, tag.capitalize())
+                out.append((1.0 - n / s.scheduler_min_tag_evidence, "thin_tag", f"{angle} on: {prompt}", tag))
+
+        by_url: Dict[str, List[dict]] = {}
+        for e in evidence:
+            for u in [e.get("url")] + list(e.get("also_sources") or []):
+                by_url.setdefault(u, []).append(e)
+        for log_item in state.get("search_log", []) or []:
+            # follow-ups are not chased again, and a cut task is the deadline's business
+            if log_item.get("round", 1) > 1 or log_item.get("cutoff"):
+                continue
+            found = [e for u in log_item.get("urls") or [] for e in by_url.get(u, [])]
+            n = len(self.sources(found))
+            if n < s.scheduler_min_sources:
+                out.append((
+                    0.6 * (1.0 - n / s.scheduler_min_sources),
+                    "single_source",
+                    f"Independent sources corroborating: {log_item.get('objective')}",
+                    log_item.get("agent") or "general",
+                ))
+
+        # prompt terms that no site, or only one, mentions
+        hosts_by_term: Dict[str, Set[str]] = {}
+        terms = token_set(prompt)
+        for e in evidence:
+            for t in terms & token_set(e.get("quote") or ""):
+                hosts_by_term.setdefault(t, set()).add(host(e.get("url")))
+        thin = sorted(t for t in terms if len(hosts_by_term.get(t, ())) < s.scheduler_min_sources)
+        if terms and thin:
+            missing = sum(1 for t in thin if t not in hosts_by_term)
+            score = 0.8 * missing / len(terms) + 0.4 * (len(thin) - missing) / len(terms)
+            out.append((score, "thin_terms", f"{prompt} (focus: {', '.join(thin)})", "general"))
+        return out
+
+    async def run_iter(
+        self,
+        state: dict,
+        prefetched=None,
+        until: Optional[float] = None,
+        use_cache: bool = True,
+    ) -> AsyncIterator[Tuple[dict, list]]:
+        s = self.settings
+        stats = state.setdefault("explore_stats", {})
+        schedule = {"rounds": [], "stopped": None}
+        state["schedule"] = schedule
+        started = time.monotonic()
+        latency_until = started + s.scheduler_latency_budget_s
+        round_until = latency_until if until is None else min(until, latency_until)
+
+        t = time.monotonic()
+        async for item in self.explorer.run_iter(state, prefetched, until, use_cache=use_cache):
+            yield item
+        evidence = state.get("evidence", []) or []
+        schedule["rounds"].append({
+            "round": 1,
+            "tasks": len(state.get("tasks", []) or []),
+            "searches": self.searches(state),
+            "evidence": len(evidence),
+            "sources": len(self.sources(evidence)),
+            "elapsed_s": round(time.monotonic() - t, 3),
+        })
+
+        tried: Set[str] = {(l.get("objective") or "").lower() for l in state.get("search_log", []) or []}
+        # follow-ups are capped by the searches round 1 made as well as the absolute budget,
+        # so a narrow plan cannot multiply its cost
+        planned = schedule["rounds"][0]["searches"]
+        max_searches = min(s.scheduler_max_searches, planned + max(1, math.ceil(planned * s.scheduler_max_followup_ratio)))
+        while True:
+            spent = self.searches(state)
+            slowest = max(r["elapsed_s"] for r in schedule["rounds"])
+            stop = None
+            if stats.get("cutoff_tasks"):
+                # the request deadline already cut planned work; no time to go deeper
+                stop = "deadline"
+            elif len(schedule["rounds"]) >= s.scheduler_max_rounds:
+                stop = "max_rounds"
+            elif spent >= max_searches:
+                stop = "cost_budget"
+            elif time_left(round_until) < slowest:
+                # a follow-up round takes about as long as the slowest round so far
+                stop = "latency_budget"
+            if stop is None:
+                # best gaps first; objectives already searched in this run are skipped
+                queue = [(-gap[0], i, gap) for i, gap in enumerate(self.gaps(state))]
+                heapq.heapify(queue)
+                picked: List[Gap] = []
+                limit = min(s.scheduler_followups_per_round, max_searches - spent)
+                while queue and len(picked) < limit:
+                    _, _, gap = heapq.heappop(queue)
+                    if gap[2].lower() not in tried:
+                        tried.add(gap[2].lower())
+                        picked.append(gap)
+                if not picked:
+                    stop = "no_gaps"
+            if stop is not None:
+                break
+
+            before = len(state.get("evidence", []) or [])
+            sources_before = self.sources(state.get("evidence", []) or [])
+            cutoffs = len(stats.get("cutoff_tasks", []))
+            number = len(schedule["rounds"]) + 1
+            kinds = {objective: kind for _, kind, objective, _ in picked}
+            t = time.monotonic()
+            async for log_item, ev in self.explorer.run_iter(
+                state, None, round_until,
+                tasks=[{"task": objective, "tag": tag} for _, _, objective, tag in picked],
+                use_cache=use_cache,
+            ):
+                if log_item:
+                    log_item["round"] = number
+                    log_item["gap"] = kinds.get(log_item.get("objective"))
+                yield log_item, ev
+            for _, kind, _, _ in picked:
+                SCHEDULER_FOLLOWUPS.inc(gap=kind)
+
+            # an optional round running out of time is not a degraded run: its cutoffs stay here
+            cut = stats.get("cutoff_tasks", [])[cutoffs:]
+            if cut:
+                del stats["cutoff_tasks"][cutoffs:]
+            evidence = state.get("evidence", []) or []
+            new_sources = self.sources(evidence) - sources_before
+            gain = (len(evidence) - before) / max(1, before)
+            schedule["rounds"].append({
+                "round": number,
+                "tasks": len(picked),
+                "gaps": [{"gap": kind, "score": round(score, 3), "objective": objective, "tag": tag}
+                         for score, kind, objective, tag in picked],
+                "searches": self.searches(state) - spent,
+                "evidence": len(evidence),
+                "new_evidence": len(evidence) - before,
+                "new_sources": len(new_sources),
+                "gain": round(gain, 3),
+                "elapsed_s": round(time.monotonic() - t, 3),
+                **({"cutoff": len(cut)} if cut else {}),
+            })
+            if gain < s.scheduler_min_gain:
+                stop = "low_gain"
+                break
+
+        schedule["stopped"] = stop
+        schedule["searches"] = self.searches(state)
+        schedule["elapsed_s"] = round(time.monotonic() - started, 3)
+        SCHEDULER_STOPS.inc(reason=stop)
+        logger.info({"schedule": {"rounds": len(schedule["rounds"]), "stopped": stop, "searches": schedule["searches"]}})
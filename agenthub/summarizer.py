@@ -1,50 +1,84 @@
+import asyncio
 import json
+import logging
+from typing import Any, AsyncIterator, Optional, Tuple
+
+from core.deadline import time_left
+from core.jsonstream import IncrementalJSONObject
+from core.packing import item_size, pack_evidence, shard_evidence
+
+logger = logging.getLogger("summarizer")
+
+STREAMED_ARRAYS = ("key_insights", "claims", "sections", "tables", "references")
+# summary arrays whose items cite evidence, and the field that identifies an item across runs
+CITING_ARRAYS = {"key_insights": None, "claims": None, "sections": "heading", "tables": "title"}
+
+SYSTEM = (
+    "You are a careful research synthesizer.\n"
+    "Use ONLY the provided evidence.\n"
+    "Do not create or invent facts.\n"
+    "Prefer concrete claims with citations."
+)
+
 
 class SummarizerAgent:
     def __init__(self, client, settings):
         self.client = client
         self.settings = settings
 
-    def run(self, state):
+    def select_evidence(self, state):
         prompt = state["prompt"]
         evidence = state.get("evidence", []) or []
 
         MAX_ITEMS = self.settings.max_evidence_items
-        MAX_CHARS = self.settings.max_evidence_chars
+        # a deadline can shrink the budget so the summary fits in the time that is left
+        MAX_CHARS = state.get("evidence_budget_chars") or self.settings.max_evidence_chars
 
-        trimmed = []
-        total = 0
-        for e in evidence[:MAX_ITEMS]:
-            item = {
-                "agent": e.get("agent", ""),
-                "url": e.get("url", ""),
-                "quote": (e.get("quote", "") or "").strip()
-            }
-            s = json.dumps(item, ensure_ascii=False)
-            if total + len(s) > MAX_CHARS:
-                break
-            trimmed.append(item)
-            total += len(s)
-
-        system = (
-            "You are a careful research synthesizer.\n"
-            "Use ONLY the provided evidence.\n"
-            "Do not create or invent facts.\n"
-            "Prefer concrete claims with citations."
+        if self.settings.evidence_packing == "ranked":
+            trimmed, state["packing"] = pack_evidence(
+                prompt, evidence, MAX_ITEMS, MAX_CHARS, self.settings.evidence_tag_min_share
+            )
+        else:
+            trimmed = []
+            total = 0
+            for e in evidence[:MAX_ITEMS]:
+                item = {
+                    "agent": e.get("agent", ""),
+                    "url": e.get("url", ""),
+                    "quote": (e.get("quote", "") or "").strip()
+                }
+                s = json.dumps(item, ensure_ascii=False)
+                if total + len(s) > MAX_CHARS:
+                    break
+                trimmed.append(item)
+                total += len(s)
+        return trimmed
+
+    def build_prompt(self, state):
+        trimmed = self.select_evidence(state)
+        user = self.summary_prompt(
+            state["prompt"],
+            "Evidence (JSON list of {agent,url,quote}):",
+            json.dumps(trimmed, ensure_ascii=False, indent=2),
         )
+        return SYSTEM, user, trimmed
 
-        user = f"""
+    def summary_prompt(self, prompt: str, label: str, material: str) -> str:
+        return f"""
             Topic:
             {prompt}
 
-            Evidence (JSON list of {{agent,url,quote}}):
-            {json.dumps(trimmed, ensure_ascii=False, indent=2)}
+            {label}
+            {material}
 
             Produce ONLY valid JSON (no markdown, no extra text) with this schema:
 
             {{
             "title": "short title",
             "main_summary": "2-5 sentences max",
+            "key_insights": [
+            {{"insight": "1-2 sentence insight", "sources": ["url1","url2"]}}
+            ],
             "claims": [
                 {{
                 "claim": "1-2 sentence claim",
@@ -53,9 +87,6 @@ class SummarizerAgent:
                 ]
                 }}
             ],
-            "key_insights": [
-            {{"insight": "1-2 sentence insight", "sources": ["url1","url2"]}}
-            ],
             "sections": [
             {{
                 "heading": "Section heading",
@@ -83,8 +114,87 @@ class SummarizerAgent:
             - If evidence is weak, say so in main_summary and create a section named "Limitations".
             """.strip()
 
-        text = self.client.complete(system=system, user=user)
+    def needs_map_reduce(self, state) -> bool:
+        # map-reduce adds a model round trip, so it is skipped when a deadline cut the budget
+        if not self.settings.map_reduce or state.get("evidence_budget_chars"):
+            return False
+        total = 0
+        for e in state.get("evidence", []) or []:
+            total += len(e.get("quote", "") or "") + len(e.get("url", "") or "")
+            if total > self.settings.max_evidence_chars:
+                return True
+        return False
+
+    async def map_shard(self, prompt: str, shard) -> Optional[dict]:
+        user = f"""
+            Topic:
+            {prompt}
+
+            Evidence (JSON list of {{agent,url,quote}}):
+            {json.dumps(shard, ensure_ascii=False)}
+
+            Produce ONLY valid JSON (no markdown, no extra text) with this schema:
+
+            {{
+            "key_insights": [{{"insight": "1-2 sentence insight", "sources": ["url"]}}],
+            "claims": [{{"claim": "1-2 sentence claim", "evidence": [{{"quote": "copied excerpt", "source": "url"}}]}}],
+            "points": [{{"point": "1-2 sentence point", "sources": ["url"]}}]
+            }}
+
+            Rules:
+            - At most 5 insights, 5 claims and 8 points.
+            - Every item must cite at least 1 URL from this evidence list; quotes must be copied verbatim.
+            - Only use URLs present in evidence.
+            """.strip()
+        try:
+            data = json.loads(await self.client.complete(system=SYSTEM, user=user))
+        except Exception as e:
+            logger.warning("Map shard failed | items=%d | error=%s", len(shard), e)
+            return None
+        return data if isinstance(data, dict) else None
+
+    async def build_reduce_prompt(self, state):
+        # map: summarize evidence shards concurrently; the reduce prompt merges the partials.
+        # The evidence budget is shard_chars * max_shards; tag boundaries can add partial shards.
+        prompt = state["prompt"]
+        budget = self.settings.shard_chars * self.settings.max_shards
+        selected, packing = await asyncio.to_thread(
+            pack_evidence,
+            prompt,
+            state.get("evidence", []) or [],
+            max_items=len(state.get("evidence", []) or []),
+            max_chars=budget,
+            tag_min_share=self.settings.evidence_tag_min_share,
+            knapsack=False,
+        )
+        state["packing"] = packing
+        shards = shard_evidence(selected, self.settings.shard_chars, self.settings.shard_by)
+
+        sem = asyncio.Semaphore(self.settings.max_parallel_shards)
+
+        async def one(shard):
+            async with sem:
+                return await self.map_shard(prompt, shard)
+
+        partials = await asyncio.gather(*(one(sh) for sh in shards))
+        merged = [p for p in partials if p]
+        state["map_reduce"] = {
+            "shards": len(shards),
+            "failed": len(shards) - len(merged),
+            "items": len(selected),
+            "chars": sum(item_size(it) for it in selected),
+        }
 
+        user = self.summary_prompt(
+            prompt,
+            "Partial findings, each summarized from one shard of the evidence "
+            "(JSON list of {key_insights,claims,points}; all quotes and URLs come from the evidence):",
+            json.dumps(merged, ensure_ascii=False),
+        )
+        return SYSTEM, user, selected
+
+    def parse(self, state, text: str, trimmed):
+        prompt = state["prompt"]
         try:
             state["summary_structured"] = json.loads(text)
         except Exception:
@@ -100,4 +210,150 @@ class SummarizerAgent:
                 "sections": [{"heading": "findings", "bullets": []}],
                 "tables": [],
                 "references": refs[:30],
-            }
\ No newline at end of file
+            }
+
+    async def run_iter(self, state, until: Optional[float] = None) -> AsyncIterator[Tuple[str, Optional[str], Any]]:
+        # streams the model output and yields each top-level field / array element as it closes
+        if self.needs_map_reduce(state):
+            system, user, trimmed = await self.build_reduce_prompt(state)
+        else:
+            # evidence ranking and packing is CPU-bound: keep it off the event loop
+            system, user, trimmed = await asyncio.to_thread(self.build_prompt, state)
+        parser = IncrementalJSONObject(STREAMED_ARRAYS)
+        chunks = []
+        partial = {}
+        stream = self.client.stream(system=system, user=user).__aiter__()
+        while True:
+            try:
+                delta = await asyncio.wait_for(stream.__anext__(), time_left(until))
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                # out of time: keep every field and array element that had fully arrived
+                logger.warning("Summarizer deadline reached | chars=%d", sum(len(c) for c in chunks))
+                state["summary_truncated"] = True
+                self.parse_partial(state, partial, trimmed)
+                return
+            chunks.append(delta)
+            for event in parser.feed(delta):
+                kind, key, value = event
+                if kind == "value":
+                    partial[key] = value
+                elif kind == "item":
+                    partial.setdefault(key, []).append(value)
+                yield event
+        self.parse(state, "".join(chunks).strip(), trimmed)
+
+    def parse_partial(self, state, partial: dict, trimmed):
+        summary = dict(partial)
+        summary.setdefault("title", state["prompt"][:80])
+        summary.setdefault("main_summary", "The summary was cut off by the request deadline.")
+        if not summary.get("references"):
+            summary["references"] = list(dict.fromkeys(e["url"] for e in trimmed if e.get("url")))[:30]
+        state["summary_structured"] = summary
+
+    def item_sources(self, key: str, item) -> set:
+        if not isinstance(item, dict):
+            return set()
+        if key == "claims":
+            return {ev.get("source") for ev in item.get("evidence") or [] if isinstance(ev, dict)} - {None}
+        if key == "sections":
+            return {u for b in item.get("bullets") or [] if isinstance(b, dict) for u in b.get("sources") or []}
+        return set(item.get("sources") or [])
+
+    async def refresh(self, state, previous: dict, changed_urls: set):
+        # Rewrites only the summary items that cite a changed source, plus whatever the
+        # new evidence adds; untouched items are kept verbatim.
+        prompt = state["prompt"]
+        stale = {
+            key: [i for i, it in enumerate(previous.get(key) or []) if self.item_sources(key, it) & changed_urls]
+            for key in CITING_ARRAYS
+        }
+        stale_items = {key: [previous[key][i] for i in idx] for key, idx in stale.items() if idx}
+        sources = set(changed_urls)
+        for key, items in stale_items.items():
+            for it in items:
+                sources |= self.item_sources(key, it)
+        subset = [e for e in state.get("evidence", []) or [] if e.get("url") in sources]
+        trimmed = await asyncio.to_thread(self.select_evidence, {"prompt": prompt, "evidence": subset})
+
+        kept_outline = {
+            "main_summary": previous.get("main_summary", ""),
+            "sections": [sec.get("heading") for sec in previous.get("sections") or [] if isinstance(sec, dict)],
+        }
+        user = f"""
+            Topic:
+            {prompt}
+
+            An existing research summary is being updated because some of its sources changed.
+            Current summary outline:
+            {json.dumps(kept_outline, ensure_ascii=False)}
+
+            Items that cite changed sources and must be rewritten (or dropped if the evidence no longer supports them):
+            {json.dumps(stale_items, ensure_ascii=False)}
+
+            Evidence from changed and related sources (JSON list of {{agent,url,quote}}):
+            {json.dumps(trimmed, ensure_ascii=False)}
+
+            Produce ONLY valid JSON (no markdown, no extra text) with this schema:
+            {{
+            "main_summary": "2-5 sentences, the full updated summary",
+            "key_insights": [{{"insight": "...", "sources": ["url"]}}],
+            "claims": [{{"claim": "...", "evidence": [{{"quote": "copied excerpt", "source": "url"}}]}}],
+            "sections": [{{"heading": "...", "bullets": [{{"point": "...", "sources": ["url"]}}]}}],
+            "tables": [{{"title": "...", "columns": ["..."], "rows": [["..."]], "sources": ["url"]}}]
+            }}
+
+            Rules:
+            - Return only rewritten items and items for findings the new evidence adds; omit everything else.
+            - Keep the heading of a rewritten section and the title of a rewritten table.
+            - Every item must cite at least 1 URL from the evidence list above.
+            """.strip()
+
+        text = await self.client.complete(system=SYSTEM, user=user)
+        try:
+            revised = json.loads(text)
+            if not isinstance(revised, dict):
+                raise ValueError("not an object")
+        except Exception as e:
+            logger.warning("Refresh summary unparseable, summarizing from scratch | error=%r", e)
+            await self.run(state)
+            return
+
+        summary = dict(previous)
+        if revised.get("main_summary"):
+            summary["main_summary"] = revised["main_summary"]
+        for key, ident in CITING_ARRAYS.items():
+            summary[key] = self.merge_items(previous.get(key) or [], stale[key], revised.get(key) or [], ident)
+
+        urls = {u for e in state.get("evidence", []) or [] for u in [e.get("url")] + list(e.get("also_sources") or [])}
+        cited = [u for key in CITING_ARRAYS for it in summary[key] for u in sorted(self.item_sources(key, it))]
+        summary["references"] = [
+            u for u in dict.fromkeys(list(previous.get("references") or []) + cited) if u in urls
+        ]
+        state["summary_structured"] = summary
+        state["summary_refresh"] = {"rewritten": {key: len(idx) for key, idx in stale.items()}, "evidence_items": len(trimmed)}
+
+    def merge_items(self, old: list, stale_idx: list, new: list, ident: Optional[str]) -> list:
+        # a rewrite takes the place of the stale item it names; the rest are appended
+        new = [it for it in new if isinstance(it, dict)]
+        by_ident = {}
+        if ident:
+            for it in new:
+                by_ident.setdefault((it.get(ident) or "").strip().lower(), it)
+        out, used = [], set()
+        for i, it in enumerate(old):
+            if i not in stale_idx:
+                out.append(it)
+                continue
+            name = (it.get(ident) or "").strip().lower() if ident and isinstance(it, dict) else None
+            repl = by_ident.get(name) if name else None
+            if repl is not None and id(repl) not in used:
+                out.append(repl)
+                used.add(id(repl))
+        out.extend(it for it in new if id(it) not in used)
+        return out
+
+    async def run(self, state, until: Optional[float] = None):
+        async for _ in self.run_iter(state, until):
+            pass
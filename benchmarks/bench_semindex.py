@@ -0,0 +1,80 @@
+# Semantic index: incremental add throughput and top-k query latency at scale.
+#
+# Adds --items excerpts from state.json (with per-copy edits) through add_run, then
+# pads the evidence matrix to --rows with older, jittered copies of those vectors and
+# times top-k queries over all rows and over the last day only (the explorer's case).
+# Runs in a temporary directory.
+#
+#     python -m benchmarks.bench_semindex --items 5000 --rows 300000
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("PARALLEL_API_KEY", "bench")
+
+import numpy as np
+
+from benchmarks.common import describe_ms
+from benchmarks.fakes import Fixture
+from core.semindex import SemanticIndex
+
+
+def main(args):
+    fixture = Fixture.load(args.state)
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as path:
+        index = SemanticIndex(path, args.dim)
+
+        runs = max(1, args.items // max(1, len(fixture.evidence)))
+        t = time.perf_counter()
+        for i in range(runs):
+            index.add_run({
+                "prompt": f"{fixture.prompt} ({i})",
+                "search_log": [{**log, "objective": f"{log.get('objective')} ({i})"} for log in fixture.search_log],
+                "evidence": [{**e, "quote": f"{e.get('quote')} ({i})"} for e in fixture.evidence],
+            })
+        took = time.perf_counter() - t
+        added = runs * len(fixture.evidence)
+        print(f"add_run: {added} excerpts in {took:.2f}s ({added / took:.0f}/s, {runs} runs)")
+
+        # pad to --rows with noisy copies: same cost per query as real excerpts
+        vf = index.vectors["evidence"]
+        base = vf.view().copy()
+        pad = args.rows - vf.count
+        if pad > 0:
+            rows = base[rng.integers(0, len(base), pad)] + rng.normal(0, 0.05, (pad, args.dim)).astype(np.float32)
+            rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+            # the padding goes in front of the real rows, as if it had been added earlier
+            vf.count = 0
+            vf.append(np.concatenate([rows, base]))
+            vf.count = pad + len(base)
+            # padding counts as older than a day, so fresh queries only scan the real rows
+            old = np.full(pad, time.time() - 2 * 86400)
+            index.times["evidence"] = np.concatenate([old, index.times["evidence"]])
+            index.added["evidence"] = np.concatenate([old, index.added["evidence"]])
+        print(f"evidence rows: {vf.count}, dim={args.dim}, file={os.path.getsize(vf.path) / 1e6:.0f}MB")
+
+        queries = [t["task"] for t in fixture.tasks] or [fixture.prompt]
+        for label, newer_than in (("search(evidence, all)", 0.0), ("search(evidence, last day)", time.time() - 86400)):
+            samples = []
+            for i in range(args.repeat):
+                q = queries[i % len(queries)]
+                t = time.perf_counter()
+                index.search("evidence", q, k=args.k, newer_than=newer_than)
+                samples.append(time.perf_counter() - t)
+            print(f"{label:<26} {describe_ms(samples)}")
+        index.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--state", default="state.json")
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--rows", type=int, default=300000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
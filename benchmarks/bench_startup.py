@@ -0,0 +1,148 @@
+# Cold start: time to first /health response and to first report.
+#
+# Each repeat spawns a fresh `uvicorn server:app` process (with its cache, run store
+# and index in a temporary directory) and times, from the spawn, the first successful
+# /health and a POST /research sent right after it, while /health keeps being probed
+# from another thread (its latency during warm-up is reported too). The real SDK
+# imports and client construction still happen during warm-up; the fakes are swapped
+# in right after, so the report time measures start-up rather than upstream latency.
+# --eager does the warm-up before the server starts listening, the way the controller
+# used to, for comparison. Also prints the slowest imports of `server`.
+#
+#     python -m benchmarks.bench_startup --repeat 5
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("PARALLEL_API_KEY", "bench")
+
+import httpx
+
+from benchmarks.common import describe_ms, temp_config
+
+
+def serve(args):
+    # child process: the server as uvicorn would load it, with fakes installed after warm-up
+    import uvicorn
+
+    import server
+    from benchmarks.fakes import FakeOpenAIClient, FakeParallelClient, Fixture, install
+
+    controller = server.controller
+    warm_up = controller._warm_up
+
+    def warm_then_fake():
+        warm_up()
+        fixture = Fixture.load(args.state)
+        install(controller, FakeOpenAIClient(fixture), FakeParallelClient(fixture))
+
+    controller._warm_up = warm_then_fake
+    if args.eager:
+        warm_then_fake()
+    uvicorn.run(server.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(fn, timeout_s: float) -> float:
+    t = time.perf_counter()
+    while time.perf_counter() - t < timeout_s:
+        try:
+            if fn():
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError("server did not come up")
+
+
+def start_once(args, i: int):
+    with tempfile.TemporaryDirectory() as path:
+        port = free_port()
+        env = {**os.environ, "APP_CONFIG": temp_config(path, args.config)}
+        cmd = [sys.executable, "-m", "benchmarks.bench_startup", "--serve", "--port", str(port), "--state", args.state]
+        if args.eager:
+            cmd.append("--eager")
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(cmd, env=env)
+        probes: list = []
+        stop = threading.Event()
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+                health = wait_for(lambda: client.get("/health").status_code == 200, args.timeout)
+                prober = threading.Thread(target=probe, args=(port, stop, args.probe_interval, probes))
+                prober.start()
+                r = client.post("/research", json={"prompt": f"startup bench {i}", "no_cache": True})
+                r.raise_for_status()
+                report = time.perf_counter()
+                stop.set()
+                prober.join()
+        finally:
+            stop.set()
+            proc.terminate()
+            proc.wait()
+    return health - t0, report - t0, probes
+
+
+def probe(port: int, stop: threading.Event, interval_s: float, out: list):
+    with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+        while not stop.is_set():
+            t = time.perf_counter()
+            client.get("/health").raise_for_status()
+            out.append(time.perf_counter() - t)
+            time.sleep(interval_s)
+
+
+def import_profile(top: int):
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        capture_output=True, text=True, env=os.environ,
+    ).stderr
+    rows = []
+    for line in out.splitlines():
+        m = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        # only modules imported directly by the repo's own code
+        if m and len(m.group(3)) <= 3:
+            rows.append((int(m.group(2)), m.group(4)))
+    print("slowest imports of server (cumulative):")
+    for us, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {us / 1000:8.1f}ms  {name}")
+
+
+def main(args):
+    samples = [start_once(args, i) for i in range(args.repeat)]
+    mode = "eager" if args.eager else "lazy"
+    print(f"[{mode}] first /health    {describe_ms([s[0] for s in samples])}")
+    print(f"[{mode}] first report     {describe_ms([s[1] for s in samples])}")
+    print(f"[{mode}] /health latency  {describe_ms([p for s in samples for p in s[2]])} (until the report)")
+    if args.imports:
+        import_profile(args.imports)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--state", default="state.json")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    parser.add_argument("--eager", action="store_true", help="warm up before listening (the old start-up)")
+    parser.add_argument("--imports", type=int, default=10, help="slowest imports to list, 0 to skip")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+    else:
+        main(args)
@@ -0,0 +1,74 @@
+# Pipeline state: plain dicts vs the compact RunState, on state.json.
+#
+# Memory is what --copies retained states cost (tracemalloc, after building them from
+# the JSON text). Serialization compares json of the dict shape with json of
+# RunState.to_compact(), plus the dict <-> RunState conversions themselves.
+#
+#     python -m benchmarks.bench_state --copies 200 --repeat 50
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from benchmarks.common import describe_ms
+from core.models import RunState
+
+
+def retained_bytes(build, copies: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    kept = [build(i) for i in range(copies)]
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del kept
+    return used
+
+
+def bench(label: str, fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    print(f"{label:<30} {describe_ms(samples)}")
+
+
+def main(args):
+    with open(args.state, encoding="utf-8") as f:
+        text = f.read()
+    state = json.loads(text)
+    typed = RunState.from_dict(state)
+    assert typed.to_dict() == state, "dict -> RunState -> dict is not lossless"
+    compact_text = json.dumps(typed.to_compact(), ensure_ascii=False, separators=(",", ":"))
+    assert RunState.from_compact(json.loads(compact_text)).to_dict() == state, "compact round trip is not lossless"
+    dict_text = json.dumps(state, ensure_ascii=False, separators=(",", ":"))
+
+    ev = state.get("evidence", []) or []
+    print(f"state: {len(ev)} evidence items, {len(typed.urls)} distinct URLs, "
+          f"{sum(len(e.get('url') or '') for e in ev)} URL chars across evidence")
+    print(f"json size: dict={len(dict_text)} compact={len(compact_text)} "
+          f"({100 * (1 - len(compact_text) / len(dict_text)):.0f}% smaller)")
+
+    d = retained_bytes(lambda i: json.loads(dict_text), args.copies)
+    r = retained_bytes(lambda i: RunState.from_compact(json.loads(compact_text)), args.copies)
+    print(f"retained memory for {args.copies} states: dict={d / 1e6:.2f}MB typed={r / 1e6:.2f}MB "
+          f"({100 * (1 - r / d):.0f}% less)")
+
+    bench("dict: json.dumps", lambda: json.dumps(state, ensure_ascii=False, separators=(",", ":")), args.repeat)
+    bench("typed: json.dumps(compact)",
+          lambda: json.dumps(typed.to_compact(), ensure_ascii=False, separators=(",", ":")), args.repeat)
+    bench("dict: json.loads", lambda: json.loads(dict_text), args.repeat)
+    bench("typed: from_compact(loads)", lambda: RunState.from_compact(json.loads(compact_text)), args.repeat)
+    bench("RunState.from_dict", lambda: RunState.from_dict(state), args.repeat)
+    bench("RunState.to_dict", typed.to_dict, args.repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--state", default="state.json")
+    parser.add_argument("--copies", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    main(parser.parse_args())
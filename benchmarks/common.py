@@ -0,0 +1,43 @@
+import atexit
+import os
+import shutil
+import statistics
+import tempfile
+from typing import Iterable, List
+
+import yaml
+
+
+def pct(values: Iterable[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def describe_ms(samples_s: List[float]) -> str:
+    if not samples_s:
+        return "n=0"
+    ms = [s * 1000 for s in samples_s]
+    return (f"n={len(ms)} p50={statistics.median(ms):.2f}ms p95={pct(ms, 95):.2f}ms "
+            f"p99={pct(ms, 99):.2f}ms max={max(ms):.2f}ms")
+
+
+def temp_config(path: str, base: str) -> str:
+    # a copy of `base` whose cache, run store and semantic index live under `path`
+    with open(base, "r") as f:
+        cfg = yaml.safe_load(f)
+    cfg["cache"]["path"] = os.path.join(path, "cache.sqlite3")
+    cfg["run_store"]["path"] = os.path.join(path, "runs.sqlite3")
+    cfg["semindex"]["path"] = os.path.join(path, "semindex")
+    out = os.path.join(path, "config.yaml")
+    with open(out, "w") as f:
+        yaml.safe_dump(cfg, f)
+    return out
+
+
+def isolate_storage():
+    # Points APP_CONFIG at a throwaway copy of the config, so a benchmark neither reads
+    # past runs (report history, semantic index hits) nor leaves its fake runs behind.
+    # Must run before anything builds the controller.
+    path = tempfile.mkdtemp(prefix="bench-")
+    atexit.register(shutil.rmtree, path, True)
+    os.environ["APP_CONFIG"] = temp_config(path, os.getenv("APP_CONFIG", "config.yaml"))
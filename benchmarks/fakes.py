@@ -0,0 +1,209 @@
+# Offline stand-ins for OpenAIClient and ParallelClient.
+#
+# Both replay a recorded run (state.json by default): the planner gets the recorded
+# plan and tasks, search returns the recorded URLs of the closest recorded objective,
+# extract returns the recorded quotes for each URL, and the summarizer streams the
+# recorded summary. Latency is drawn from a lognormal around a median (sigma=0 gives
+# a fixed delay) and a call fails with FakeUpstreamError at the given rate. Passing a
+# Resilience routes every call through it, as the real clients do.
+#
+#     from benchmarks.fakes import Fixture, FakeOpenAIClient, FakeParallelClient, Latency, install
+#     fixture = Fixture.load("state.json")
+#     install(controller, FakeOpenAIClient(fixture, Latency(1.5, 0.4)),
+#             FakeParallelClient(fixture, Latency(0.4, 0.3), error_rate=0.01))
+import asyncio
+import json
+import math
+import random
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from core.text import jaccard, token_set
+
+
+class FakeUpstreamError(RuntimeError):
+    # looks like a 503 to the retry policy
+    status_code = 503
+
+
+@dataclass
+class Latency:
+    median_s: float = 0.0
+    sigma: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        # "0.8" (fixed) or "0.8:0.5" (lognormal median:sigma)
+        median, _, sigma = str(spec).partition(":")
+        return cls(float(median), float(sigma or 0.0))
+
+    def sample(self, rng: random.Random) -> float:
+        if self.median_s <= 0:
+            return 0.0
+        if self.sigma <= 0:
+            return self.median_s
+        return rng.lognormvariate(math.log(self.median_s), self.sigma)
+
+
+class Fixture:
+    def __init__(self, state: dict):
+        self.prompt = state.get("prompt", "")
+        self.plan = state.get("plan", []) or []
+        self.tasks = state.get("tasks", []) or []
+        self.search_log = state.get("search_log", []) or []
+        self.evidence = state.get("evidence", []) or []
+        self.summary = self.current_schema(state.get("summary_structured", {}) or {})
+        self.quotes_by_url: Dict[str, List[str]] = {}
+        for e in self.evidence:
+            if e.get("url") and e.get("quote"):
+                self.quotes_by_url.setdefault(e["url"], []).append(e["quote"])
+        self.objective_terms = [token_set(item.get("objective", "")) for item in self.search_log]
+
+    @classmethod
+    def load(cls, path: str = "state.json") -> "Fixture":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def current_schema(self, summary: dict) -> dict:
+        # older recordings used executive_summary / key_strategic_insights and had no claims
+        out = dict(summary)
+        if "main_summary" not in out and "executive_summary" in out:
+            out["main_summary"] = out.pop("executive_summary")
+        if "key_insights" not in out and "key_strategic_insights" in out:
+            out["key_insights"] = out.pop("key_strategic_insights")
+        if "claims" not in out:
+            out["claims"] = [
+                {"claim": (e.get("quote") or "").split(". ")[0][:200],
+                 "evidence": [{"quote": (e.get("quote") or "")[:300], "source": e.get("url")}]}
+                for e in self.evidence_sample(4)
+            ]
+        return out
+
+    def evidence_sample(self, n: int) -> List[dict]:
+        seen, out = set(), []
+        for e in self.evidence:
+            if e.get("url") not in seen and e.get("quote"):
+                seen.add(e.get("url"))
+                out.append(e)
+            if len(out) >= n:
+                break
+        return out
+
+    def closest_search(self, objective: str) -> dict:
+        if not self.search_log:
+            return {"urls": []}
+        terms = token_set(objective)
+        best = max(range(len(self.search_log)), key=lambda i: jaccard(terms, self.objective_terms[i]))
+        return self.search_log[best]
+
+
+class FakeUpstream:
+    hedge = False
+
+    def __init__(
+        self,
+        fixture: Fixture,
+        latency: Latency = Latency(),
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        resilience=None,
+    ):
+        self.fixture = fixture
+        self.resilience = resilience
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls: Dict[str, int] = {}
+        self.errors = 0
+
+    async def call(self, op: str):
+        if self.resilience is None:
+            return await self.attempt(op)
+        return await self.resilience.call(op, lambda: self.attempt(op), hedge=self.hedge)
+
+    async def attempt(self, op: str):
+        self.calls[op] = self.calls.get(op, 0) + 1
+        await asyncio.sleep(self.latency.sample(self.rng))
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            raise FakeUpstreamError(f"injected {op} failure")
+
+    def connect(self):
+        # the controller's warm-up builds the real SDK clients through this; nothing to build here
+        return self
+
+    async def aclose(self):
+        pass
+
+
+class FakeOpenAIClient(FakeUpstream):
+    def __init__(
+        self,
+        fixture: Fixture,
+        latency: Latency = Latency(),
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        resilience=None,
+        chunk_chars: int = 24,
+        chunk_delay_s: float = 0.0,
+    ):
+        super().__init__(fixture, latency, error_rate, seed, resilience)
+        self.chunk_chars = chunk_chars
+        self.chunk_delay_s = chunk_delay_s
+
+    def respond(self, system: str, user: str) -> str:
+        if "planner" in system:
+            return json.dumps({"plan": self.fixture.plan, "tasks": self.fixture.tasks})
+        if '"points"' in user:
+            # map shard of the map-reduce summarizer
+            s = self.fixture.summary
+            return json.dumps({
+                "key_insights": (s.get("key_insights") or [])[:2],
+                "claims": (s.get("claims") or [])[:2],
+                "points": [b for sec in (s.get("sections") or [])[:2] for b in (sec.get("bullets") or [])[:2]],
+            })
+        return json.dumps(self.fixture.summary, ensure_ascii=False)
+
+    async def complete(self, system: str, user: str) -> str:
+        await self.call("complete")
+        return self.respond(system, user)
+
+    async def stream(self, system: str, user: str):
+        # the latency sample is the time to first token
+        await self.call("stream")
+        text = self.respond(system, user)
+        for i in range(0, len(text), self.chunk_chars):
+            if self.chunk_delay_s:
+                await asyncio.sleep(self.chunk_delay_s)
+            yield text[i:i + self.chunk_chars]
+
+
+class FakeParallelClient(FakeUpstream):
+    hedge = True
+
+    async def search(self, objective: str, *, search_queries=None, max_results=10, max_chars=200):
+        await self.call("search")
+        urls = self.fixture.closest_search(objective).get("urls", [])[:max_results]
+        return [
+            {
+                "url": u,
+                "title": u,
+                "excerpts": [q[:max_chars] for q in self.fixture.quotes_by_url.get(u, [])[:1]],
+            }
+            for u in urls
+        ]
+
+    async def extract(self, urls, objective: str, *, max_chars=1000):
+        await self.call("extract")
+        return [
+            {"url": u, "excerpts": [q[:max_chars] for q in self.fixture.quotes_by_url.get(u, [])]}
+            for u in urls
+        ]
+
+
+def install(controller, openai_client, parallel_client):
+    controller.openai_client = openai_client
+    controller.planner.client = openai_client
+    controller.summarizer.client = openai_client
+    controller.parallel_client = parallel_client
+    controller.explorer.parallel = parallel_client
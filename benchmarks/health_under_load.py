@@ -0,0 +1,81 @@
+# Measure /health latency while N research runs are in flight on one worker.
+#
+# Upstream clients are replaced with the replaying fakes in benchmarks/fakes.py, which
+# wait on the model/search the way the real SDKs do, so the numbers only reflect how
+# the event loop is shared.
+#
+#     python -m benchmarks.health_under_load --concurrency 50 --llm-latency 2.0
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("PARALLEL_API_KEY", "bench")
+
+from benchmarks.common import describe_ms, isolate_storage
+
+isolate_storage()
+
+import httpx
+
+import server
+from benchmarks.fakes import FakeOpenAIClient, FakeParallelClient, Fixture, Latency, install
+
+logging.getLogger().setLevel(logging.WARNING)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+async def probe_health(client, stop: asyncio.Event, interval_s: float):
+    samples = []
+    while not stop.is_set():
+        t = time.perf_counter()
+        r = await client.get("/health")
+        r.raise_for_status()
+        samples.append(time.perf_counter() - t)
+        await asyncio.sleep(interval_s)
+    return samples
+
+
+async def main(args):
+    fixture = Fixture.load(args.state)
+    install(
+        server.controller,
+        FakeOpenAIClient(fixture, Latency.parse(args.llm_latency), seed=0),
+        FakeParallelClient(fixture, Latency.parse(args.search_latency), seed=0),
+    )
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        stop = asyncio.Event()
+        idle_probe = asyncio.create_task(probe_health(client, stop, args.probe_interval))
+        await asyncio.sleep(1.0)
+        stop.set()
+        idle = await idle_probe
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_health(client, stop, args.probe_interval))
+        t = time.perf_counter()
+        runs = [
+            client.post("/research", json={"prompt": f"{fixture.prompt} (bench {i})"})
+            for i in range(args.concurrency)
+        ]
+        responses = await asyncio.gather(*runs)
+        wall = time.perf_counter() - t
+        stop.set()
+        loaded = await probe
+
+    ok = sum(1 for r in responses if r.status_code == 200)
+    print(f"research runs: {ok}/{args.concurrency} ok in {wall:.2f}s "
+          f"({ok / wall:.2f} runs/s)")
+    for name, samples in (("idle", idle), ("loaded", loaded)):
+        print(f"/health {name:>6}: {describe_ms(samples)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--state", default="state.json")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-latency", default="2.0", help="median[:sigma] seconds")
+    parser.add_argument("--search-latency", default="0.5", help="median[:sigma] seconds")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,110 @@
+# End-to-end load test: N concurrent clients driving server.py against the fakes.
+#
+# Each client sends requests back to back until --requests have been sent in total.
+# Prompts are unique unless --repeat-prompts is given, so by default the report cache
+# does not short-circuit the pipeline.
+#
+#     python -m benchmarks.load_test --concurrency 50 --requests 500 --llm-latency 1.5:0.4
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("PARALLEL_API_KEY", "bench")
+
+from benchmarks.common import describe_ms, isolate_storage
+
+isolate_storage()
+
+import httpx
+
+import server
+from benchmarks.fakes import FakeOpenAIClient, FakeParallelClient, Fixture, Latency, install
+from core.metrics import UPSTREAM_HEDGES, UPSTREAM_RETRIES
+from core.resilience import TokenBucket
+
+logging.getLogger().setLevel(logging.WARNING)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+async def worker(client, queue: asyncio.Queue, endpoint: str, no_cache: bool, results: list):
+    while True:
+        try:
+            prompt = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        t = time.perf_counter()
+        try:
+            r = await client.post(endpoint, json={"prompt": prompt, "no_cache": no_cache})
+            status = r.status_code
+        except Exception:
+            status = 0
+        results.append((status, time.perf_counter() - t))
+
+
+async def main(args):
+    fixture = Fixture.load(args.state)
+    controller = server.controller
+    llm = FakeOpenAIClient(
+        fixture, Latency.parse(args.llm_latency), args.llm_error_rate, seed=args.seed,
+        resilience=None if args.no_resilience else controller.openai_resilience,
+    )
+    parallel = FakeParallelClient(
+        fixture, Latency.parse(args.search_latency), args.search_error_rate, seed=args.seed,
+        resilience=None if args.no_resilience else controller.parallel_resilience,
+    )
+    install(controller, llm, parallel)
+    # the configured client-side limits apply unless overridden here
+    for resilience, rps in ((controller.openai_resilience, args.openai_rps), (controller.parallel_resilience, args.parallel_rps)):
+        if rps is not None:
+            resilience.requests = TokenBucket(rps, max(rps * 2, 1))
+    if args.hedge is not None:
+        controller.parallel_resilience.hedge_percentile = args.hedge
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(args.requests):
+        prompt = fixture.prompt if args.repeat_prompts else f"{fixture.prompt} (load {i})"
+        queue.put_nowait(prompt)
+
+    results = []
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        t = time.perf_counter()
+        await asyncio.gather(*(
+            worker(client, queue, args.endpoint, not args.repeat_prompts, results)
+            for _ in range(args.concurrency)
+        ))
+        wall = time.perf_counter() - t
+
+    ok = [s for status, s in results if status == 200]
+    failed = len(results) - len(ok)
+    print(f"{args.endpoint}: {len(results)} requests, concurrency={args.concurrency}, "
+          f"llm={args.llm_latency}s search={args.search_latency}s")
+    print(f"throughput: {len(ok) / wall:.2f} ok req/s over {wall:.2f}s, failed={failed}")
+    print(f"latency (ok): {describe_ms(ok)}")
+    print(f"upstream calls: llm={llm.calls} parallel={parallel.calls} "
+          f"injected errors: llm={llm.errors} parallel={parallel.errors}")
+    for metric in (UPSTREAM_RETRIES, UPSTREAM_HEDGES):
+        for labels, n in sorted(metric.values.items()):
+            print(f"{metric.name}{dict(zip(metric.labelnames, labels))}: {n:g}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--state", default="state.json")
+    parser.add_argument("--endpoint", default="/research", choices=["/research", "/research/stream"])
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--llm-latency", default="1.0:0.4", help="median[:sigma] seconds")
+    parser.add_argument("--search-latency", default="0.3:0.4", help="median[:sigma] seconds")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--search-error-rate", type=float, default=0.0)
+    parser.add_argument("--repeat-prompts", action="store_true")
+    parser.add_argument("--no-resilience", action="store_true", help="bypass rate limits, retries and hedging")
+    parser.add_argument("--openai-rps", type=float, default=None, help="override upstream.openai_rps (0 = unlimited)")
+    parser.add_argument("--parallel-rps", type=float, default=None, help="override upstream.parallel_rps (0 = unlimited)")
+    parser.add_argument("--hedge", type=float, default=None, help="hedge Parallel calls past this latency percentile")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
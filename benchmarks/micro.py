@@ -0,0 +1,81 @@
+# Microbenchmarks for the CPU-bound steps of a run, on data from state.json.
+#
+# Evidence is the recorded evidence repeated --scale times with small per-copy edits,
+# so dedup and packing see both exact and near duplicates.
+#
+#     python -m benchmarks.micro --scale 20 --repeat 20
+import argparse
+import copy
+import json
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("PARALLEL_API_KEY", "bench")
+
+from agenthub.explorer import ExplorerAgent
+from agenthub.markdown import MarkdownAgent
+from agenthub.summarizer import SummarizerAgent
+from benchmarks.common import describe_ms
+from benchmarks.fakes import Fixture
+from core.config import load_settings
+from core.safety import PromptInjectionGuard
+
+
+def scaled_evidence(fixture: Fixture, scale: int) -> list:
+    out = []
+    for copy_i in range(scale):
+        for j, e in enumerate(fixture.evidence):
+            quote = e.get("quote") or ""
+            if copy_i % 3 == 1:
+                quote = quote.replace(" the ", " a ", 1)
+            elif copy_i % 3 == 2:
+                quote = f"{quote} ({copy_i}-{j})"
+            out.append({"agent": e.get("agent"), "url": f"{e.get('url')}#{copy_i % 4}", "quote": quote})
+    return out
+
+
+def bench(label: str, fn, setup, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        arg = setup()
+        t = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - t)
+    print(f"{label:<28} {describe_ms(samples)}")
+
+
+def main(args):
+    settings = load_settings()
+    fixture = Fixture.load(args.state)
+    evidence = scaled_evidence(fixture, args.scale)
+    chars = sum(len(e["quote"]) for e in evidence)
+    print(f"evidence: {len(evidence)} items, {chars / 1e6:.2f}M chars (scale={args.scale})")
+
+    explorer = ExplorerAgent(None, settings)
+    summarizer = SummarizerAgent(None, settings)
+    markdown = MarkdownAgent(settings)
+    guard = PromptInjectionGuard()
+
+    def fresh_state():
+        return {"prompt": fixture.prompt, "evidence": [dict(e) for e in evidence]}
+
+    bench("dedup_evidence", explorer.dedup_evidence, fresh_state, args.repeat)
+    bench("summarizer.select_evidence", summarizer.select_evidence, fresh_state, args.repeat)
+    bench("summarizer.build_prompt", summarizer.build_prompt, fresh_state, args.repeat)
+    bench("guard.validate_prompt", guard.validate_prompt, lambda: fixture.prompt, args.repeat)
+    bench("guard.validate_evidence", guard.validate_evidence, fresh_state, args.repeat)
+
+    report_state = {"prompt": fixture.prompt, "evidence": evidence, "summary_structured": fixture.summary}
+    bench("markdown.run", markdown.run, lambda: copy.copy(report_state), args.repeat)
+
+    raw = json.dumps(fixture.summary, ensure_ascii=False)
+    bench("summarizer.parse", lambda s: summarizer.parse(s, raw, evidence), fresh_state, args.repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--state", default="state.json")
+    parser.add_argument("--scale", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
@@ -1,17 +1,119 @@
-import os
-from openai import OpenAI
+import threading
+from typing import AsyncIterator
+
+from core.metrics import UPSTREAM_SECONDS, record_usage
+from core.resilience import Resilience
+
+
+def total_tokens(usage):
+    if usage is None:
+        return None
+    return (getattr(usage, "input_tokens", 0) or 0) + (getattr(usage, "output_tokens", 0) or 0)
+
 
 class OpenAIClient:
-    def __init__(self, model: str):
-        self.client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+    def __init__(
+        self,
+        model: str,
+        *,
+        api_key: str | None = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        timeout_s: float = 60.0,
+        resilience: Resilience | None = None,
+    ):
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.timeout_s = timeout_s
+        self.resilience = resilience
         self.model = model
+        self.lock = threading.Lock()
+        self._client = None
+
+    def connect(self):
+        # importing the SDK takes most of a second, so it happens here rather than at import
+        # time; the controller calls this from a worker thread while the server starts
+        with self.lock:
+            if self._client is None:
+                import httpx
+                from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+                # one pooled async client per process; every concurrent run shares its connections
+                self.http_client = DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections,
+                    ),
+                    timeout=self.timeout_s,
+                )
+                self._client = AsyncOpenAI(
+                    # None lets the SDK fall back to OPENAI_API_KEY and fail with its own message
+                    api_key=self.api_key or None,
+                    http_client=self.http_client,
+                    # retries are ours when a policy is configured, so the SDK must not retry underneath it
+                    **({"max_retries": 0} if self.resilience is not None else {}),
+                )
+        return self._client
+
+    @property
+    def client(self):
+        return self._client or self.connect()
+
+    async def _call(self, op: str, fn, tokens: float = 0):
+        if self.resilience is None:
+            return await fn()
+        return await self.resilience.call(op, fn, tokens=tokens)
+
+    def _settle(self, estimated: int, usage):
+        if self.resilience is not None:
+            self.resilience.settle(estimated, total_tokens(usage))
+
+    async def complete(self, system: str, user: str) -> str:
+        # ~4 chars per token is close enough to pace the tokens/min bucket; settled from usage after
+        estimated = (len(system) + len(user)) // 4
+
+        async def once():
+            with UPSTREAM_SECONDS.time(upstream="openai", op="complete"):
+                return await self.client.responses.create(
+                    model=self.model,
+                    input=[
+                        {"role": "system", "content": system},
+                        {"role": "user", "content": user},
+                    ],
+                )
+
+        resp = await self._call("complete", once, estimated)
+        usage = getattr(resp, "usage", None)
+        record_usage(usage)
+        self._settle(estimated, usage)
+        return (resp.output_text or "").strip()
+
+    async def stream(self, system: str, user: str) -> AsyncIterator[str]:
+        estimated = (len(system) + len(user)) // 4
+
+        async def open_stream():
+            return await self.client.responses.create(
+                model=self.model,
+                input=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": user},
+                ],
+                stream=True,
+            )
+
+        with UPSTREAM_SECONDS.time(upstream="openai", op="stream"):
+            # only opening the stream is retried; once deltas are flowing a failure surfaces
+            stream = await self._call("stream", open_stream, estimated)
+            async with stream:
+                async for event in stream:
+                    if event.type == "response.output_text.delta":
+                        yield event.delta
+                    elif event.type == "response.completed":
+                        usage = getattr(event.response, "usage", None)
+                        record_usage(usage)
+                        self._settle(estimated, usage)
 
-    def complete(self, system: str, user: str) -> str:
-        resp = self.client.responses.create(
-            model=self.model,
-            input=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
-        )
-        return (resp.output_text or "").strip()
\ No newline at end of file
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
@@ -1,29 +1,137 @@
-import os
-from parallel import Parallel
+import threading
+
+from core.cache import TieredCache, cache_key
+from core.metrics import UPSTREAM_SECONDS
+from core.resilience import Resilience
+
+
+def _as_dict(r) -> dict:
+    if isinstance(r, dict):
+        return r
+    return r.model_dump(mode="json")
+
 
 class ParallelClient:
-    def __init__(self, beta_version: str):
+    def __init__(
+        self,
+        beta_version: str,
+        *,
+        api_key: str | None = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        timeout_s: float = 60.0,
+        cache: TieredCache | None = None,
+        search_ttl_s: float = 0,
+        extract_ttl_s: float = 0,
+        resilience: Resilience | None = None,
+    ):
+        self.beta_version = beta_version
         self.betas = [beta_version]
-        self.client = Parallel(
-            api_key=os.environ["PARALLEL_API_KEY"],
-            default_headers={"parallel-beta": beta_version},
-        )
-
-    def search(self, objective: str, *, search_queries=None, max_results=10, max_chars=200):
-        resp = self.client.beta.search(
-            objective=objective,
-            search_queries=search_queries or [],
-            max_results=max_results,
-            excerpts={"max_chars_per_result": max_chars},
-        )
+        self.cache = cache
+        self.search_ttl_s = search_ttl_s
+        self.extract_ttl_s = extract_ttl_s
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.timeout_s = timeout_s
+        self.resilience = resilience
+        self.lock = threading.Lock()
+        self._client = None
+
+    def connect(self):
+        # deferred SDK import and construction, see OpenAIClient.connect
+        with self.lock:
+            if self._client is None:
+                import httpx
+                from parallel import AsyncParallel, DefaultAsyncHttpxClient
+
+                # shared pool for every explorer task across all in-flight runs
+                self.http_client = DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections,
+                    ),
+                    timeout=self.timeout_s,
+                )
+                self._client = AsyncParallel(
+                    api_key=self.api_key or None,
+                    default_headers={"parallel-beta": self.beta_version},
+                    http_client=self.http_client,
+                    **({"max_retries": 0} if self.resilience is not None else {}),
+                )
+        return self._client
+
+    @property
+    def client(self):
+        return self._client or self.connect()
+
+    async def _call(self, op: str, fn):
+        # search and extract are idempotent, so they may be hedged as well as retried
+        if self.resilience is None:
+            return await fn()
+        return await self.resilience.call(op, fn, hedge=True)
+
+    async def search(self, objective: str, *, search_queries=None, max_results=10, max_chars=200):
+        key = None
+        if self.cache is not None:
+            key = cache_key("search", objective, search_queries or [], max_results, self.beta_version, max_chars)
+            hit = await self.cache.get(key)
+            if hit is not None:
+                return hit
+
+        async def once():
+            with UPSTREAM_SECONDS.time(upstream="parallel", op="search"):
+                return await self.client.beta.search(
+                    objective=objective,
+                    search_queries=search_queries or [],
+                    max_results=max_results,
+                    excerpts={"max_chars_per_result": max_chars},
+                )
+
+        resp = await self._call("search", once)
+        results = [_as_dict(r) for r in resp.results]
+
+        if key is not None:
+            await self.cache.set(key, results, self.search_ttl_s)
+        return results
+
+    async def extract(self, urls, objective: str, *, max_chars=1000):
+        if self.cache is None:
+            return [_as_dict(r) for r in await self._extract(urls, objective, max_chars)]
+
+        # cached per URL, so a batch only pays for the URLs we have not seen recently
+        keys = {u: cache_key("extract", u, self.beta_version, max_chars) for u in urls}
+        found = {}
+        for u in urls:
+            hit = await self.cache.get(keys[u])
+            if hit is not None:
+                found[u] = hit
+
+        missing = [u for u in urls if u not in found]
+        if missing:
+            for r in await self._extract(missing, objective, max_chars):
+                r = _as_dict(r)
+                u = r.get("url")
+                if u in keys:
+                    found[u] = r
+                    await self.cache.set(keys[u], r, self.extract_ttl_s)
+
+        return [found[u] for u in urls if u in found]
+
+    async def _extract(self, urls, objective: str, max_chars: int):
+        async def once():
+            with UPSTREAM_SECONDS.time(upstream="parallel", op="extract"):
+                return await self.client.beta.extract(
+                    betas=self.betas,
+                    urls=urls,
+                    objective=objective,
+                    excerpts={"max_chars_per_result": max_chars},
+                    full_content=False,
+                )
+
+        resp = await self._call("extract", once)
         return resp.results
 
-    def extract(self, urls, objective: str, *, max_chars=1000):
-        resp = self.client.beta.extract(
-            betas=self.betas,
-            urls=urls,
-            objective=objective,
-            excerpts={"max_chars_per_result": max_chars},
-            full_content=False,
-        )
-        return resp.results
\ No newline at end of file
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
@@ -0,0 +1,63 @@
+from typing import Any, Dict, List, Set, Tuple
+
+from core.text import coverage, jaccard, token_set
+
+
+def merge_tasks(task_lists: List[List[Dict[str, Any]]], threshold: float) -> Tuple[List[Dict[str, Any]], List[Set[int]]]:
+    # One shared task per group of near-identical objectives (same tag, token Jaccard
+    # >= threshold) across every prompt of a batch. owners[i] holds the indexes of
+    # the prompts whose plans asked for shared task i.
+    shared: List[Dict[str, Any]] = []
+    tokens: List[Set[str]] = []
+    owners: List[Set[int]] = []
+    for p, tasks in enumerate(task_lists):
+        for t in tasks:
+            objective = (t.get("task") or "").strip()
+            if not objective:
+                continue
+            tag = (t.get("tag") or "general").strip()
+            terms = token_set(objective)
+            for i, s in enumerate(shared):
+                if s["tag"] == tag and (s["task"] == objective or jaccard(terms, tokens[i]) >= threshold):
+                    owners[i].add(p)
+                    break
+            else:
+                shared.append({"task": objective, "tag": tag})
+                tokens.append(terms)
+                owners.append({p})
+    return shared, owners
+
+
+def url_owners(search_log: List[Dict[str, Any]], shared: List[Dict[str, Any]], owners: List[Set[int]]) -> Dict[str, Set[int]]:
+    # which prompts asked (through their objectives) for each explored URL
+    by_objective = {s["task"]: owners[i] for i, s in enumerate(shared)}
+    out: Dict[str, Set[int]] = {}
+    for log_item in search_log:
+        prompts = by_objective.get(log_item.get("objective"), set())
+        for u in log_item.get("urls") or []:
+            out.setdefault(u, set()).update(prompts)
+    return out
+
+
+def evidence_by_prompt(
+    prompts: Dict[int, str],
+    pool: List[Dict[str, Any]],
+    owners_by_url: Dict[str, Set[int]],
+    min_relevance: float,
+) -> Dict[int, List[Dict[str, Any]]]:
+    # each prompt gets everything its own objectives found, plus pooled evidence from
+    # other prompts' objectives that mentions enough of its terms; every quote is
+    # tokenized once for the whole batch
+    quote_terms = [token_set(e.get("quote") or "") for e in pool]
+    owned = [
+        set().union(*(owners_by_url.get(u, ()) for u in [e.get("url")] + list(e.get("also_sources") or [])))
+        for e in pool
+    ]
+    out = {}
+    for index, prompt in prompts.items():
+        terms = token_set(prompt)
+        out[index] = [
+            dict(e) for e, own, quote in zip(pool, owned, quote_terms)
+            if index in own or coverage(terms, quote) >= min_relevance
+        ]
+    return out
@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from core.metrics import CACHE_LOOKUPS
+
+
+def normalize_prompt(prompt: str) -> str:
+    return re.sub(r"\s+", " ", (prompt or "").casefold()).strip()
+
+
+def cache_key(*parts) -> str:
+    raw = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.items: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str):
+        item = self.items.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at <= time.time():
+            del self.items[key]
+            return None
+        self.items.move_to_end(key)
+        return value
+
+    def set(self, key: str, value, ttl_s: float):
+        self.items[key] = (value, time.time() + ttl_s)
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_entries:
+            self.items.popitem(last=False)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class SqliteStore:
+    def __init__(self, path: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        self.evictions = 0
+
+    def get(self, key: str):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._delete(key)
+                self.conn.commit()
+                return None
+            self.conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value, ttl_s: float):
+        raw = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        now = time.time()
+        with self.lock:
+            self._delete(key)
+            self.conn.execute(
+                "INSERT INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, raw, len(raw), now + ttl_s, now),
+            )
+            self.total_bytes += len(raw)
+            if self.total_bytes > self.max_bytes:
+                self._evict(now)
+            self.conn.commit()
+
+    def _delete(self, key: str):
+        row = self.conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        if row:
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.total_bytes -= row[0]
+
+    def _evict(self, now: float):
+        expired = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE expires_at <= ?", (now,)
+        ).fetchone()
+        self.conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        self.total_bytes -= expired[1]
+        self.evictions += expired[0]
+
+        # then least-recently-used until we are 10% under the cap, to avoid evicting on every write
+        target = int(self.max_bytes * 0.9)
+        rows = self.conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class TieredCache:
+    def __init__(self, memory: LRUCache, disk: Optional[SqliteStore] = None, name: str = "tiered"):
+        self.memory = memory
+        self.disk = disk
+        self.name = name
+        self.stats: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0}
+
+    async def get(self, key: str) -> Any:
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            CACHE_LOOKUPS.inc(cache=self.name, result="memory_hit")
+            return value
+        if self.disk is not None:
+            row = await asyncio.to_thread(self.disk.get, key)
+            if row is not None:
+                value, expires_at = row
+                self.stats["disk_hits"] += 1
+                CACHE_LOOKUPS.inc(cache=self.name, result="disk_hit")
+                self.memory.set(key, value, expires_at - time.time())
+                return value
+        self.stats["misses"] += 1
+        CACHE_LOOKUPS.inc(cache=self.name, result="miss")
+        return None
+
+    async def set(self, key: str, value, ttl_s: float):
+        self.stats["sets"] += 1
+        self.memory.set(key, value, ttl_s)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value, ttl_s)
+
+    def snapshot(self) -> Dict[str, int]:
+        out = dict(self.stats)
+        out["memory_entries"] = len(self.memory)
+        if self.disk is not None:
+            out["disk_bytes"] = self.disk.total_bytes
+            out["disk_evictions"] = self.disk.evictions
+        return out
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+
+class SingleFlight:
+    def __init__(self):
+        self.inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        task = self.inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # shielded so one caller disconnecting does not cancel the run for everyone else
+        return await asyncio.shield(task), shared
+
+    def __len__(self):
+        return len(self.inflight)
@@ -1,21 +1,129 @@
 import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict
+
 import yaml
-from dataclasses import dataclass
 
-CONFIG_PATH = os.getenv("APP_CONFIG", "config.yaml")
-cfg = yaml.safe_load(open(CONFIG_PATH, "r"))
+
+@lru_cache(maxsize=None)
+def load_config(path: str) -> Dict[str, Any]:
+    with open(path, "r") as f:
+        return yaml.safe_load(f)
+
 
 @dataclass
 class Settings:
     openai_model: str
+    openai_api_key: str = field(repr=False)
+    parallel_api_key: str = field(repr=False)
+    parallel_beta_version: str
+
+    http_max_connections: int
+    http_max_keepalive_connections: int
+    http_timeout_s: float
+
+    openai_rps: float
+    openai_burst: float
+    openai_tpm: float
+    parallel_rps: float
+    parallel_burst: float
+    retry_max_attempts: int
+    retry_backoff_base_s: float
+    retry_backoff_max_s: float
+    retry_budget_ratio: float
+    retry_deadline_s: float
+    hedge_enabled: bool
+    hedge_percentile: float
+    hedge_min_samples: int
+    hedge_budget_ratio: float
 
     max_urls_per_task: int
     max_search_results: int
     max_search_excerpt_chars: int
     max_extract_chars: int
+    parallel_max_concurrency: int
+    batch_extract: bool
+    extract_batch_size: int
+    tiered_evidence: bool
+    excerpt_min_score: float
+    excerpt_min_chars: int
+    extract_top_k: int
+
+    cache_enabled: bool
+    cache_path: str
+    cache_memory_max_entries: int
+    cache_disk_max_mb: int
+    cache_search_ttl_s: float
+    cache_extract_ttl_s: float
+
+    run_store_enabled: bool
+    run_store_path: str
+    run_store_max_queue: int
+    run_store_retention_days: float
+
+    semindex_enabled: bool
+    semindex_path: str
+    semindex_dim: int
+    semindex_task_min_sim: float
+    semindex_evidence_min_sim: float
+    semindex_max_age_s: float
+    semindex_top_k: int
+
+    speculative_enabled: bool
+    speculative_min_overlap: float
+
+    report_cache_enabled: bool
+    report_cache_max_entries: int
+    report_cache_ttl_s: float
 
     max_evidence_items: int
     max_evidence_chars: int
+    evidence_packing: str
+    evidence_tag_min_share: float
+    near_dup_enabled: bool
+    near_dup_threshold: float
+    near_dup_shingle_size: int
+
+    scan_evidence: bool
+    evidence_action: str
+
+    map_reduce: bool
+    shard_by: str
+    shard_chars: int
+    max_shards: int
+    max_parallel_shards: int
+
+    scheduler_enabled: bool
+    scheduler_max_rounds: int
+    scheduler_followups_per_round: int
+    scheduler_max_searches: int
+    scheduler_max_followup_ratio: float
+    scheduler_latency_budget_s: float
+    scheduler_min_gain: float
+    scheduler_min_tag_evidence: int
+    scheduler_min_sources: int
+
+    deadline_default_s: float
+    deadline_planner_share: float
+    deadline_explorer_share: float
+    deadline_summarizer_base_s: float
+    deadline_summarizer_chars_per_s: float
+    deadline_min_evidence_chars: int
+
+    refresh_max_evidence_age_s: float
+    refresh_max_changed_share: float
+
+    batch_max_prompts: int
+    batch_objective_threshold: float
+    batch_objective_max_chars: int
+    batch_min_relevance: float
+    batch_summary_concurrency: int
+
+    job_workers: int
+    job_max_queue: int
+    job_retention_s: float
+    job_max_retained: int
 
     max_refs: int
     max_insights: int
@@ -29,19 +137,121 @@ class Settings:
 
 
 def load_settings() -> Settings:
+    cfg = load_config(os.getenv("APP_CONFIG", "config.yaml"))
     return Settings(
         openai_model=os.getenv(
             "OPENAI_MODEL",
             cfg["models"]["openai"],
         ),
+        openai_api_key=os.getenv("OPENAI_API_KEY", ""),
+        parallel_api_key=os.getenv("PARALLEL_API_KEY", ""),
+        parallel_beta_version=cfg["parallel"]["beta_version"],
+
+        http_max_connections=cfg["http"]["max_connections"],
+        http_max_keepalive_connections=cfg["http"]["max_keepalive_connections"],
+        http_timeout_s=cfg["http"]["timeout_s"],
+
+        openai_rps=cfg["upstream"]["openai_rps"],
+        openai_burst=cfg["upstream"]["openai_burst"],
+        openai_tpm=cfg["upstream"]["openai_tpm"],
+        parallel_rps=cfg["upstream"]["parallel_rps"],
+        parallel_burst=cfg["upstream"]["parallel_burst"],
+        retry_max_attempts=cfg["upstream"]["max_attempts"],
+        retry_backoff_base_s=cfg["upstream"]["backoff_base_s"],
+        retry_backoff_max_s=cfg["upstream"]["backoff_max_s"],
+        retry_budget_ratio=cfg["upstream"]["retry_budget_ratio"],
+        retry_deadline_s=cfg["upstream"]["deadline_s"],
+        hedge_enabled=cfg["upstream"]["hedge"],
+        hedge_percentile=cfg["upstream"]["hedge_percentile"],
+        hedge_min_samples=cfg["upstream"]["hedge_min_samples"],
+        hedge_budget_ratio=cfg["upstream"]["hedge_budget_ratio"],
 
         max_urls_per_task=cfg["parallel"]["max_urls_per_task"],
         max_search_results=cfg["parallel"]["max_search_results"],
         max_search_excerpt_chars=cfg["parallel"]["max_search_excerpt_chars"],
         max_extract_chars=cfg["parallel"]["max_extract_chars"],
+        parallel_max_concurrency=cfg["parallel"]["max_concurrency"],
+        batch_extract=cfg["parallel"]["batch_extract"],
+        extract_batch_size=cfg["parallel"]["extract_batch_size"],
+        tiered_evidence=cfg["parallel"]["tiered_evidence"],
+        excerpt_min_score=cfg["parallel"]["excerpt_min_score"],
+        excerpt_min_chars=cfg["parallel"]["excerpt_min_chars"],
+        extract_top_k=cfg["parallel"]["extract_top_k"],
+
+        cache_enabled=cfg["cache"]["enabled"],
+        cache_path=os.getenv("CACHE_PATH", cfg["cache"]["path"]),
+        cache_memory_max_entries=cfg["cache"]["memory_max_entries"],
+        cache_disk_max_mb=cfg["cache"]["disk_max_mb"],
+        cache_search_ttl_s=cfg["cache"]["search_ttl_s"],
+        cache_extract_ttl_s=cfg["cache"]["extract_ttl_s"],
+
+        run_store_enabled=cfg["run_store"]["enabled"],
+        run_store_path=os.getenv("RUN_STORE_PATH", cfg["run_store"]["path"]),
+        run_store_max_queue=cfg["run_store"]["max_queue"],
+        run_store_retention_days=cfg["run_store"]["retention_days"],
+
+        semindex_enabled=cfg["semindex"]["enabled"],
+        semindex_path=os.getenv("SEMINDEX_PATH", cfg["semindex"]["path"]),
+        semindex_dim=cfg["semindex"]["dim"],
+        semindex_task_min_sim=cfg["semindex"]["task_min_sim"],
+        semindex_evidence_min_sim=cfg["semindex"]["evidence_min_sim"],
+        semindex_max_age_s=cfg["semindex"]["max_age_s"],
+        semindex_top_k=cfg["semindex"]["top_k"],
+
+        speculative_enabled=cfg["speculative"]["enabled"],
+        speculative_min_overlap=cfg["speculative"]["min_overlap"],
+
+        report_cache_enabled=cfg["report_cache"]["enabled"],
+        report_cache_max_entries=cfg["report_cache"]["max_entries"],
+        report_cache_ttl_s=cfg["report_cache"]["ttl_s"],
 
         max_evidence_items=cfg["evidence"]["max_items"],
         max_evidence_chars=cfg["evidence"]["max_chars"],
+        evidence_packing=cfg["evidence"]["packing"],
+        evidence_tag_min_share=cfg["evidence"]["tag_min_share"],
+        near_dup_enabled=cfg["evidence"]["near_dup"],
+        near_dup_threshold=cfg["evidence"]["near_dup_threshold"],
+        near_dup_shingle_size=cfg["evidence"]["near_dup_shingle_size"],
+
+        scan_evidence=cfg["safety"]["scan_evidence"],
+        evidence_action=cfg["safety"]["evidence_action"],
+
+        map_reduce=cfg["summarizer"]["map_reduce"],
+        shard_by=cfg["summarizer"]["shard_by"],
+        shard_chars=cfg["summarizer"]["shard_chars"],
+        max_shards=cfg["summarizer"]["max_shards"],
+        max_parallel_shards=cfg["summarizer"]["max_parallel_shards"],
+
+        scheduler_enabled=cfg["scheduler"]["enabled"],
+        scheduler_max_rounds=cfg["scheduler"]["max_rounds"],
+        scheduler_followups_per_round=cfg["scheduler"]["followups_per_round"],
+        scheduler_max_searches=cfg["scheduler"]["max_searches"],
+        scheduler_max_followup_ratio=cfg["scheduler"]["max_followup_ratio"],
+        scheduler_latency_budget_s=cfg["scheduler"]["latency_budget_s"],
+        scheduler_min_gain=cfg["scheduler"]["min_gain"],
+        scheduler_min_tag_evidence=cfg["scheduler"]["min_tag_evidence"],
+        scheduler_min_sources=cfg["scheduler"]["min_sources"],
+
+        deadline_default_s=cfg["deadline"]["default_s"],
+        deadline_planner_share=cfg["deadline"]["planner_share"],
+        deadline_explorer_share=cfg["deadline"]["explorer_share"],
+        deadline_summarizer_base_s=cfg["deadline"]["summarizer_base_s"],
+        deadline_summarizer_chars_per_s=cfg["deadline"]["summarizer_chars_per_s"],
+        deadline_min_evidence_chars=cfg["deadline"]["min_evidence_chars"],
+
+        refresh_max_evidence_age_s=cfg["refresh"]["max_evidence_age_s"],
+        refresh_max_changed_share=cfg["refresh"]["max_changed_share"],
+
+        batch_max_prompts=cfg["batch"]["max_prompts"],
+        batch_objective_threshold=cfg["batch"]["objective_threshold"],
+        batch_objective_max_chars=cfg["batch"]["objective_max_chars"],
+        batch_min_relevance=cfg["batch"]["min_relevance"],
+        batch_summary_concurrency=cfg["batch"]["summary_concurrency"],
+
+        job_workers=cfg["jobs"]["workers"],
+        job_max_queue=cfg["jobs"]["max_queue"],
+        job_retention_s=cfg["jobs"]["retention_s"],
+        job_max_retained=cfg["jobs"]["max_retained"],
 
         max_refs=cfg["report"]["max_refs"],
         max_insights=cfg["report"]["max_insights"],
@@ -55,12 +265,7 @@ def load_settings() -> Settings:
     )
 
 
-class ParallelConfig:
-    API_KEY = os.environ["PARALLEL_API_KEY"]
-    BETA_VERSION = cfg["parallel"]["beta_version"]
-    BETAS = [BETA_VERSION]
-
-
-class OpenAIConfig:
-    API_KEY = os.environ["OPENAI_API_KEY"]
-    MODEL = os.getenv("OPENAI_MODEL", cfg["models"]["openai"])
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    # config.yaml and the environment are read once per process, on first use rather than at import
+    return load_settings()
@@ -1,84 +1,635 @@
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+import asyncio
 import logging
 import time
 
-from core.models import init_state
-from core.config import load_settings, OpenAIConfig, ParallelConfig
+from core.models import RunState, init_state
+from core.batch import evidence_by_prompt, merge_tasks, url_owners
+from core.config import get_settings
+from core.cache import LRUCache, SingleFlight, SqliteStore, TieredCache, normalize_prompt
+from core.deadline import Deadline, time_left
+from core.resilience import Resilience
+from core.runstore import RunStore
+from core.speculation import Speculation
+from core.metrics import (
+    BATCH_SAVED, CACHE_LOOKUPS, DEADLINE_CUTOFFS, EVIDENCE_BYTES, EVIDENCE_ITEMS, REFRESHES, RUNS, RUNS_IN_FLIGHT,
+    SAFETY_BLOCKS, STAGE_SECONDS,
+    install_trace_logging, stage, trace_id_var,
+)
 
 from clients.openai_client import OpenAIClient
 from clients.parallel_client import ParallelClient
 
 from agenthub.planner import PlannerAgent
 from agenthub.explorer import ExplorerAgent
+from agenthub.scheduler import ExplorationScheduler
 from agenthub.summarizer import SummarizerAgent
 from agenthub.markdown import MarkdownAgent
 from core.safety import PromptInjectionGuard, blocked_prompt_response
 
 logger = logging.getLogger("research")
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:[%(trace_id)s] %(message)s")
+install_trace_logging()
+
+class BatchRuns:
+    # Run accounting for the prompts of a batch, matching what _events does for a single
+    # run: each prompt not answered from the report cache is in flight until it ends
+    # with an outcome, and its total time is observed.
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.open: Set[int] = set()
+
+    def start(self, i: int):
+        self.open.add(i)
+        RUNS_IN_FLIGHT.inc()
+
+    def end(self, i: int, outcome: str):
+        if i not in self.open:
+            return
+        self.open.discard(i)
+        RUNS_IN_FLIGHT.dec()
+        RUNS.inc(outcome=outcome)
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, stage="total")
+
+    def end_all(self, outcome: str):
+        for i in list(self.open):
+            self.end(i, outcome)
 
 class ResearchController:
     def __init__(self):
-        self.settings = load_settings()
+        self.settings = get_settings()
+
+        self.openai_resilience = self._resilience(
+            "openai", self.settings.openai_rps, self.settings.openai_burst, self.settings.openai_tpm
+        )
+        self.parallel_resilience = self._resilience(
+            "parallel", self.settings.parallel_rps, self.settings.parallel_burst, 0
+        )
 
+        # the SDK clients are built by warm_up(), not here, so importing the server stays cheap
         self.openai_client = OpenAIClient(
-            model=self.settings.openai_model
+            model=self.settings.openai_model,
+            api_key=self.settings.openai_api_key,
+            max_connections=self.settings.http_max_connections,
+            max_keepalive_connections=self.settings.http_max_keepalive_connections,
+            timeout_s=self.settings.http_timeout_s,
+            resilience=self.openai_resilience,
         )
 
+        self.parallel_cache = None
+        if self.settings.cache_enabled:
+            self.parallel_cache = TieredCache(
+                LRUCache(self.settings.cache_memory_max_entries),
+                SqliteStore(self.settings.cache_path, self.settings.cache_disk_max_mb * 1024 * 1024),
+                name="parallel",
+            )
+
         self.parallel_client = ParallelClient(
-            beta_version=ParallelConfig.BETA_VERSION
+            beta_version=self.settings.parallel_beta_version,
+            api_key=self.settings.parallel_api_key,
+            max_connections=self.settings.http_max_connections,
+            max_keepalive_connections=self.settings.http_max_keepalive_connections,
+            timeout_s=self.settings.http_timeout_s,
+            cache=self.parallel_cache,
+            search_ttl_s=self.settings.cache_search_ttl_s,
+            extract_ttl_s=self.settings.cache_extract_ttl_s,
+            resilience=self.parallel_resilience,
         )
 
         self.planner = PlannerAgent(
             client=self.openai_client
         )
 
+        # opened by warm_up() as well: it loads numpy and every row's timestamps
+        self.index = None
+
         self.explorer = ExplorerAgent(
             parallel_client=self.parallel_client,
             settings=self.settings,
+            index=self.index,
         )
 
+        self.scheduler = ExplorationScheduler(self.explorer, self.settings)
+
         self.summarizer = SummarizerAgent(
             client=self.openai_client,
             settings=self.settings,
         )
 
         self.markdown = MarkdownAgent(self.settings)
-        self.guard = PromptInjectionGuard()
+        self.guard = PromptInjectionGuard(self.settings.evidence_action)
+
+        self.report_cache = LRUCache(self.settings.report_cache_max_entries)
+        self.inflight = SingleFlight()
+
+        self.background = set()
+
+        self.run_store = None
+        if self.settings.run_store_enabled:
+            self.run_store = RunStore(
+                self.settings.run_store_path,
+                self.settings.run_store_max_queue,
+                self.settings.run_store_retention_days,
+            )
+
+        self.warmup: Optional[asyncio.Task] = None
+
+    def _warm_up(self):
+        # runs in a worker thread: SDK imports, client construction and the index load
+        # together take about a second, during which the event loop keeps serving /health
+        t = time.perf_counter()
+        try:
+            self.openai_client.connect()
+            self.parallel_client.connect()
+            if self.settings.semindex_enabled and self.index is None:
+                from core.semindex import SemanticIndex
+
+                self.index = SemanticIndex(self.settings.semindex_path, self.settings.semindex_dim)
+                self.explorer.index = self.index
+        except Exception:
+            # every run re-raises this from wait_ready(); /health stays up with ready=false
+            logger.exception("Warm-up failed")
+            raise
+        logger.info({"warm_up_s": round(time.perf_counter() - t, 3)})
+
+    def warm_up(self) -> asyncio.Task:
+        if self.warmup is None:
+            self.warmup = asyncio.create_task(asyncio.to_thread(self._warm_up))
+        return self.warmup
+
+    @property
+    def ready(self) -> bool:
+        w = self.warmup
+        return w is not None and w.done() and not w.cancelled() and w.exception() is None
+
+    async def wait_ready(self):
+        # shielded: a cancelled request must not cancel the warm-up the others wait on
+        await asyncio.shield(self.warm_up())
+
+    def _resilience(self, name: str, rps: float, burst: float, tpm: float) -> Resilience:
+        return Resilience(
+            name,
+            rps=rps,
+            burst=burst,
+            tpm=tpm,
+            max_attempts=self.settings.retry_max_attempts,
+            backoff_base_s=self.settings.retry_backoff_base_s,
+            backoff_max_s=self.settings.retry_backoff_max_s,
+            retry_budget_ratio=self.settings.retry_budget_ratio,
+            deadline_s=self.settings.retry_deadline_s,
+            hedge_percentile=self.settings.hedge_percentile if self.settings.hedge_enabled else 0,
+            hedge_min_samples=self.settings.hedge_min_samples,
+            hedge_budget_ratio=self.settings.hedge_budget_ratio,
+        )
+
+    def _record(self, prompt: str, state: Dict[str, Any]):
+        # queued for the background writer; the id goes out with the response
+        if self.run_store is not None:
+            run_id = self.run_store.record(prompt, state, trace_id_var.get())
+            if run_id:
+                state["run_id"] = run_id
+
+    def _index_run(self, state: Dict[str, Any]):
+        # embedding a run's evidence takes a while, so it happens in a worker thread
+        if self.index is None:
+            return
+        task = asyncio.create_task(asyncio.to_thread(self.index.add_run, state))
+        self.background.add(task)
+        task.add_done_callback(self.background.discard)
+
+    def _remember(self, key: str, state: Dict[str, Any]):
+        if not self.settings.report_cache_enabled:
+            return
+        # a run cut short by its deadline should not be served to callers with more time
+        if state.get("deadline", {}).get("degraded"):
+            return
+        if state.get("final_report") and not state.get("safety", {}).get("blocked"):
+            # kept in compact form: one copy of each URL, slotted records instead of dicts
+            self.report_cache.set(key, RunState.from_dict(state), self.settings.report_cache_ttl_s)
+
+    async def run_pipeline(
+        self,
+        prompt: str,
+        use_cache: bool = True,
+        deadline_s: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        key = normalize_prompt(prompt)
+        deadline_s = deadline_s or self.settings.deadline_default_s
+
+        if self.settings.report_cache_enabled and use_cache:
+            hit = self.report_cache.get(key)
+            if hit is not None:
+                CACHE_LOOKUPS.inc(cache="report", result="hit")
+                logger.info({"report_cache": "hit", "inflight": len(self.inflight)})
+                return {**hit.to_dict(), "cached": True}
+            # callers with different deadlines must not share a run
+            state, shared = await self.inflight.do(f"{key}|{deadline_s}", lambda: self._run(prompt, deadline_s, use_cache))
+            CACHE_LOOKUPS.inc(cache="report", result="coalesced" if shared else "miss")
+        else:
+            state, shared = await self._run(prompt, deadline_s, use_cache), False
+
+        if not shared:
+            self._remember(key, state)
+        return {**state, "cached": shared}
+
+    async def stream_pipeline(
+        self,
+        prompt: str,
+        use_cache: bool = True,
+        deadline_s: Optional[float] = None,
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        key = normalize_prompt(prompt)
+        deadline_s = deadline_s or self.settings.deadline_default_s
+
+        if self.settings.report_cache_enabled and use_cache:
+            hit = self.report_cache.get(key)
+            CACHE_LOOKUPS.inc(cache="report", result="miss" if hit is None else "hit")
+            if hit is not None:
+                yield "done", {**hit.to_dict(), "cached": True}
+                return
+
+        async for event, payload in self._events(prompt, deadline_s, use_cache):
+            if event == "done":
+                self._remember(key, payload)
+                payload = {**payload, "cached": False}
+            yield event, payload
+
+    async def _run(self, prompt: str, deadline_s: Optional[float] = None, use_cache: bool = True) -> Dict[str, Any]:
+        async for event, payload in self._events(prompt, deadline_s, use_cache):
+            if event in ("done", "blocked"):
+                return payload
+        raise RuntimeError("pipeline ended without a result")
 
-    async def run_pipeline(self, prompt: str) -> Dict[str, Any]:
+    async def _events(
+        self, prompt: str, deadline_s: Optional[float] = None, use_cache: bool = True
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        outcome = "error"
+        with RUNS_IN_FLIGHT.track():
+            try:
+                # a run that arrives during start-up waits for the clients; its deadline starts after
+                await self.wait_ready()
+                with STAGE_SECONDS.time(stage="total"):
+                    async for event, payload in self._pipeline(prompt, Deadline(deadline_s), use_cache):
+                        if event in ("done", "blocked"):
+                            outcome = event
+                            self._record(prompt, payload)
+                            if event == "done":
+                                self._index_run(payload)
+                        yield event, payload
+            except (GeneratorExit, asyncio.CancelledError):
+                # _run stops consuming right after "done"/"blocked", which is not a cancellation
+                if outcome == "error":
+                    outcome = "cancelled"
+                raise
+            finally:
+                RUNS.inc(outcome=outcome)
+
+    async def _pipeline(
+        self, prompt: str, deadline: Deadline, use_cache: bool = True
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
         res = self.guard.validate_prompt(prompt)
         if res.blocked:
-            return blocked_prompt_response(res)
+            SAFETY_BLOCKS.inc(stage="prompt")
+            yield "blocked", blocked_prompt_response(res)
+            return
 
         state = init_state(prompt)
 
         timings = {}
-        t = time.time()
+        state["timings"] = timings
+
+        if deadline.active:
+            state["deadline"] = {"budget_s": deadline.budget_s, "cutoff_tasks": [], "degraded": False}
 
-        self.planner.run(state)
+        speculation = self._speculate(prompt)
+        with stage(timings, "planner"):
+            try:
+                await asyncio.wait_for(
+                    self.planner.run(state),
+                    time_left(deadline.at(self.settings.deadline_planner_share)),
+                )
+            except asyncio.TimeoutError:
+                # no time to wait for a plan: the generic angles still produce a report
+                state["plan"] = [f"Research: {prompt}"]
+                state["tasks"] = PlannerAgent.fallback_tasks(prompt)
+                # without a deadline the timeout came from the planner call itself
+                if deadline.active:
+                    state["deadline"]["planner_cutoff"] = True
+            except BaseException:
+                if speculation:
+                    speculation.cancel()
+                raise
         plan_res = self.guard.validate_planner(state)
         if plan_res.blocked:
-            return blocked_prompt_response(plan_res)
-        timings["planner_s"] = round(time.time() - t, 3)
+            if speculation:
+                speculation.cancel()
+            SAFETY_BLOCKS.inc(stage="planner")
+            yield "blocked", blocked_prompt_response(plan_res)
+            return
+
+        prefetched = {}
+        if speculation:
+            prefetched = speculation.adopt(state["tasks"], self.settings.speculative_min_overlap)
+            state["speculation"] = speculation.stats
+            timings["speculative_hidden_s"] = speculation.stats["hidden_s"]
+        yield "plan", {"plan": state["plan"], "tasks": state["tasks"]}
+
+        with stage(timings, "explorer"):
+            until = deadline.at(self.settings.deadline_explorer_share)
+            explore = self.scheduler.run_iter if self.settings.scheduler_enabled else self.explorer.run_iter
+            async for log_item, ev in explore(state, prefetched, until, use_cache=use_cache):
+                yield "task", {"search_log": log_item, "evidence_count": len(ev)}
 
-        t = time.time()
-        await self.explorer.run(state)
-        timings["explorer_s"] = round(time.time() - t, 3)
+        if self.settings.scan_evidence:
+            with stage(timings, "evidence_scan"):
+                ev_res = self.guard.validate_evidence(state)
+            if ev_res.matches:
+                SAFETY_BLOCKS.inc(state["evidence_safety"]["flagged"], stage="evidence")
 
-        t = time.time()
-        self.summarizer.run(state)
-        timings["summarizer_s"] = round(time.time() - t, 3)
+        evidence = state.get("evidence", []) or []
+        EVIDENCE_ITEMS.inc(len(evidence))
+        EVIDENCE_BYTES.inc(sum(len((e.get("quote") or "").encode("utf-8")) for e in evidence))
 
-        t = time.time()
-        self.markdown.run(state)
-        timings["markdown_s"] = round(time.time() - t, 3)
+        if deadline.active:
+            self._fit_to_deadline(state, deadline)
+
+        # report lines are rendered while the summary is still streaming in
+        with stage(timings, "summarizer"):
+            t = time.perf_counter()
+            renderer = self.markdown.progressive(state)
+            async for kind, key, value in self.summarizer.run_iter(state, deadline.at()):
+                lines = renderer.feed(kind, key, value)
+                if lines:
+                    if "summarizer_first_section_s" not in timings:
+                        timings["summarizer_first_section_s"] = round(time.perf_counter() - t, 3)
+                    yield "section", {"markdown": "\n".join(lines)}
+
+        if deadline.active:
+            info = state["deadline"]
+            info["summary_truncated"] = state.pop("summary_truncated", False)
+            info["elapsed_s"] = round(deadline.elapsed(), 3)
+            info["degraded"] = bool(
+                info["cutoff_tasks"] or info.get("planner_cutoff") or info["summary_truncated"]
+            )
+            for item in info["cutoff_tasks"]:
+                DEADLINE_CUTOFFS.inc(stage=item["stage"])
+            if info.get("planner_cutoff"):
+                DEADLINE_CUTOFFS.inc(stage="planner")
+            if info["summary_truncated"]:
+                DEADLINE_CUTOFFS.inc(stage="summarizer")
+
+        with stage(timings, "markdown"):
+            yield "section", {"markdown": "\n".join(renderer.finish())}
+            self.markdown.run(state)
 
         logger.info({
             "timings": timings,
             "tasks": len(state.get("tasks", [])),
             "evidence": len(state.get("evidence", [])),
+            "explore": state.get("explore_stats", {}),
+            "evidence_safety": state.get("evidence_safety"),
             "blocked": state.get("safety", {}).get("blocked", False),
+            "cache": self.parallel_cache.snapshot() if self.parallel_cache else None,
         })
 
-        return state
\ No newline at end of file
+        yield "done", state
+
+    def _fit_to_deadline(self, state: Dict[str, Any], deadline: Deadline):
+        info = state["deadline"]
+        info["cutoff_tasks"] = state.get("explore_stats", {}).get("cutoff_tasks", [])
+        # the summary call is roughly a fixed cost plus time proportional to the evidence sent
+        left = deadline.remaining()
+        budget = int((left - self.settings.deadline_summarizer_base_s) * self.settings.deadline_summarizer_chars_per_s)
+        if budget < self.settings.max_evidence_chars:
+            budget = max(self.settings.deadline_min_evidence_chars, budget)
+            state["evidence_budget_chars"] = budget
+            info["evidence_budget_chars"] = budget
+        info["summarizer_budget_s"] = round(left, 3)
+
+    async def run_batch(self, prompts: List[str], use_cache: bool = True) -> Dict[str, Any]:
+        # Plans every prompt, explores the union of their objectives once (near-identical
+        # objectives and repeated URLs are searched/extracted a single time), then
+        # summarizes each prompt from the shared evidence pool.
+        await self.wait_ready()
+        runs = BatchRuns()
+        try:
+            return await self._run_batch(prompts, use_cache, runs)
+        except asyncio.CancelledError:
+            runs.end_all("cancelled")
+            raise
+        finally:
+            runs.end_all("error")
+
+    async def _run_batch(self, prompts: List[str], use_cache: bool, runs: BatchRuns) -> Dict[str, Any]:
+        timings: Dict[str, float] = {}
+        results: List[Optional[Dict[str, Any]]] = [None] * len(prompts)
+        first: Dict[str, int] = {}
+        states: Dict[int, Dict[str, Any]] = {}
+
+        for i, prompt in enumerate(prompts):
+            key = normalize_prompt(prompt)
+            if key in first:
+                continue
+            first[key] = i
+            res = self.guard.validate_prompt(prompt)
+            if res.blocked:
+                SAFETY_BLOCKS.inc(stage="prompt")
+                runs.start(i)
+                runs.end(i, "blocked")
+                results[i] = blocked_prompt_response(res)
+                continue
+            if self.settings.report_cache_enabled and use_cache:
+                hit = self.report_cache.get(key)
+                CACHE_LOOKUPS.inc(cache="report", result="miss" if hit is None else "hit")
+                if hit is not None:
+                    results[i] = {**hit.to_dict(), "cached": True}
+                    continue
+            runs.start(i)
+            states[i] = init_state(prompt)
+            states[i]["timings"] = {}
+
+        async def plan(state):
+            try:
+                await self.planner.run(state)
+            except Exception as e:
+                logger.warning("Batch planner failed | error=%r", e)
+                state["plan"] = [f"Research: {state['prompt']}"]
+                state["tasks"] = PlannerAgent.fallback_tasks(state["prompt"])
+
+        with stage(timings, "batch_planner"):
+            await asyncio.gather(*(plan(s) for s in states.values()))
+        for i, state in list(states.items()):
+            plan_res = self.guard.validate_planner(state)
+            if plan_res.blocked:
+                SAFETY_BLOCKS.inc(stage="planner")
+                runs.end(i, "blocked")
+                results[i] = blocked_prompt_response(plan_res)
+                del states[i]
+
+        order = list(states)
+        shared_tasks, owners = merge_tasks([states[i]["tasks"] for i in order], self.settings.batch_objective_threshold)
+        owners = [{order[p] for p in o} for o in owners]
+
+        # the extract objective has to serve every prompt of the batch at once
+        pool = init_state("; ".join(states[i]["prompt"] for i in order)[:self.settings.batch_objective_max_chars])
+        pool["tasks"] = shared_tasks
+        with stage(timings, "batch_explorer"):
+            await self.explorer.run(pool, use_cache=use_cache)
+        if self.settings.scan_evidence:
+            ev_res = self.guard.validate_evidence(pool)
+            if ev_res.matches:
+                SAFETY_BLOCKS.inc(pool["evidence_safety"]["flagged"], stage="evidence")
+        EVIDENCE_ITEMS.inc(len(pool["evidence"]))
+        EVIDENCE_BYTES.inc(sum(len((e.get("quote") or "").encode("utf-8")) for e in pool["evidence"]))
+
+        # the pool is indexed once; each prompt is indexed on its own below
+        self._index_run({**pool, "prompt": None})
+        owners_by_url = url_owners(pool["search_log"], shared_tasks, owners)
+        objectives_of = {i: {s["task"] for s, o in zip(shared_tasks, owners) if i in o} for i in order}
+        # matching the whole pool against every prompt is CPU-bound: off the event loop
+        evidence = await asyncio.to_thread(
+            evidence_by_prompt,
+            {i: states[i]["prompt"] for i in order},
+            pool["evidence"],
+            owners_by_url,
+            self.settings.batch_min_relevance,
+        )
+        for i in order:
+            state = states[i]
+            state["search_log"] = [l for l in pool["search_log"] if l.get("objective") in objectives_of[i]]
+            state["evidence"] = evidence[i]
+
+        semaphore = asyncio.Semaphore(self.settings.batch_summary_concurrency)
+
+        async def finish(i):
+            state = states[i]
+            async with semaphore:
+                with stage(state["timings"], "summarizer"):
+                    await self.summarizer.run(state)
+            with stage(state["timings"], "markdown"):
+                self.markdown.run(state)
+            self._record(state["prompt"], state)
+            self._index_run({"prompt": state["prompt"], "run_id": state.get("run_id")})
+            self._remember(normalize_prompt(state["prompt"]), state)
+            runs.end(i, "done")
+            return {**state, "cached": False}
+
+        with stage(timings, "batch_summarizer"):
+            done = await asyncio.gather(*(finish(i) for i in order), return_exceptions=True)
+        for i, res in zip(order, done):
+            if isinstance(res, Exception):
+                logger.warning("Batch summary failed | prompt=%d | error=%r", i, res)
+                runs.end(i, "error")
+                res = {"prompt": prompts[i], "error": str(res)}
+            results[i] = res
+        for i, prompt in enumerate(prompts):
+            if results[i] is None:
+                results[i] = results[first[normalize_prompt(prompt)]]
+
+        explore = pool.get("explore_stats", {})
+        planned = sum(len([t for t in states[i]["tasks"] if (t.get("task") or "").strip()]) for i in order)
+        stats = {
+            "prompts": len(prompts),
+            "unique_prompts": len(first),
+            "explored_prompts": len(order),
+            "objectives_planned": planned,
+            "objectives_explored": len(shared_tasks),
+            "searches_saved": planned - len(shared_tasks),
+            "extract_urls_requested": explore.get("extract_urls_requested", 0),
+            "extract_urls_unique": explore.get("extract_urls_unique", 0),
+            "extract_urls_saved": explore.get("extract_urls_saved", 0),
+            "evidence_pool": len(pool["evidence"]),
+            "near_duplicates_merged": explore.get("near_duplicates_merged", 0),
+            "timings": timings,
+        }
+        BATCH_SAVED.inc(stats["searches_saved"], kind="search")
+        BATCH_SAVED.inc(stats["extract_urls_saved"], kind="extract_url")
+        logger.info({"batch": stats, "explore": explore})
+        return {"results": results, "stats": stats}
+
+    async def refresh_pipeline(self, run_id: Optional[str] = None, prompt: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        # Brings a stored run up to date: same tasks, fresh searches, extracts only for new
+        # or expired URLs, and a summary rewrite limited to what the changed sources touch.
+        store = self.run_store
+        if store is None:
+            raise RuntimeError("refresh needs the run store")
+        await self.wait_ready()
+        run_id = run_id or await asyncio.to_thread(store.latest, prompt or "")
+        previous = await asyncio.to_thread(store.load, run_id) if run_id else None
+        if previous is None:
+            return None
+        if previous.get("safety", {}).get("blocked"):
+            raise ValueError("a blocked run cannot be refreshed")
+
+        prompt = previous["prompt"]
+        state = init_state(prompt)
+        state["plan"] = previous.get("plan", [])
+        state["tasks"] = previous.get("tasks", [])
+        timings = state["timings"] = {}
+        started = time.time()
+
+        with stage(timings, "explorer"):
+            await self.explorer.refresh(state, previous, self.settings.refresh_max_evidence_age_s)
+        if self.settings.scan_evidence:
+            ev_res = self.guard.validate_evidence(state)
+            if ev_res.matches:
+                SAFETY_BLOCKS.inc(state["evidence_safety"]["flagged"], stage="evidence")
+
+        def keys(evidence):
+            return {(e.get("url"), e.get("quote")) for e in evidence or []}
+
+        before, after = keys(previous.get("evidence")), keys(state["evidence"])
+        changed = {url for url, _ in before ^ after}
+        all_urls = {url for url, _ in before | after}
+        if not changed:
+            result = "unchanged"
+            state["summary_structured"] = previous.get("summary_structured", {})
+            state["final_report"] = previous.get("final_report", "")
+        else:
+            result = "full" if len(changed) > self.settings.refresh_max_changed_share * len(all_urls) else "partial"
+            with stage(timings, "summarizer"):
+                if result == "full":
+                    await self.summarizer.run(state)
+                else:
+                    await self.summarizer.refresh(state, previous.get("summary_structured", {}) or {}, changed)
+            with stage(timings, "markdown"):
+                self.markdown.run(state)
+
+        state["refresh"] = {
+            "from_run": run_id,
+            "result": result,
+            "evidence_added": len(after - before),
+            "evidence_removed": len(before - after),
+            "changed_urls": len(changed),
+        }
+        REFRESHES.inc(result=result)
+        logger.info({"refresh": state["refresh"], "timings": timings, "explore": state.get("explore_stats", {})})
+
+        self._record(prompt, state)
+        # carried-over evidence is already in the index
+        fresh = [e for e in state["evidence"] if e.get("fetched_at", 0) >= started]
+        self._index_run({**state, "evidence": fresh})
+        self._remember(normalize_prompt(prompt), state)
+        return {**state, "cached": False}
+
+    def _speculate(self, prompt: str):
+        if not self.settings.speculative_enabled:
+            return None
+        tasks = PlannerAgent.fallback_tasks(prompt)
+        if self.guard.validate_planner({"tasks": tasks}).blocked:
+            return None
+        return Speculation(self.explorer, prompt, tasks)
+
+    async def aclose(self):
+        if self.warmup is not None:
+            await asyncio.gather(self.warmup, return_exceptions=True)
+        await self.openai_client.aclose()
+        await self.parallel_client.aclose()
+        if self.parallel_cache is not None:
+            self.parallel_cache.close()
+        if self.run_store is not None:
+            await self.run_store.stop()
+            self.run_store.close()
+        if self.index is not None:
+            await asyncio.gather(*self.background, return_exceptions=True)
+            self.index.close()
\ No newline at end of file
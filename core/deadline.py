@@ -0,0 +1,58 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Iterable, List, Optional
+
+# Marks an awaitable that had not finished when its deadline passed.
+CUTOFF = object()
+
+
+class Deadline:
+    # Wall-clock budget for one request, on the monotonic clock. budget_s <= 0 means
+    # no deadline: every method then behaves as if there were time left.
+    def __init__(self, budget_s: Optional[float]):
+        self.budget_s = budget_s if budget_s and budget_s > 0 else None
+        self.started = time.monotonic()
+
+    @property
+    def active(self) -> bool:
+        return self.budget_s is not None
+
+    def at(self, share: float = 1.0) -> Optional[float]:
+        # absolute time by which the first `share` of the budget is spent
+        if self.budget_s is None:
+            return None
+        return self.started + self.budget_s * share
+
+    def remaining(self) -> Optional[float]:
+        return time_left(self.at())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+
+def time_left(until: Optional[float]) -> Optional[float]:
+    return None if until is None else max(0.0, until - time.monotonic())
+
+
+async def gather_until(aws: Iterable[Awaitable[Any]], until: Optional[float]) -> List[Any]:
+    # like gather(..., return_exceptions=True), but anything still running at `until`
+    # is cancelled and reported as CUTOFF
+    futures = [asyncio.ensure_future(a) for a in aws]
+    if not futures:
+        return []
+    pending = set(futures)
+    try:
+        _, pending = await asyncio.wait(futures, timeout=time_left(until))
+    finally:
+        for f in pending:
+            f.cancel()
+
+    out = []
+    for f in futures:
+        if f in pending or f.cancelled():
+            out.append(CUTOFF)
+        elif f.exception() is not None:
+            out.append(f.exception())
+        else:
+            out.append(f.result())
+    return out
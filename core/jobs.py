@@ -0,0 +1,176 @@
+import asyncio
+import itertools
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from core.metrics import JOB_QUEUE_DEPTH, JOB_WAIT_SECONDS, JOB_WORKERS_BUSY, JOBS, trace_id_var
+from core.models import RunState
+
+logger = logging.getLogger("jobs")
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after_s: int):
+        super().__init__(f"job queue is full, retry after {retry_after_s}s")
+        self.retry_after_s = retry_after_s
+
+
+@dataclass
+class Job:
+    id: str
+    prompt: str
+    priority: int
+    use_cache: bool
+    trace_id: str
+    deadline_s: Optional[float] = None
+    status: str = "queued"    # queued | running | done | blocked | failed
+    stage: str = "queued"     # last pipeline event seen: plan, task, section, ...
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    tasks_done: int = 0
+    result: Optional[RunState] = None
+    error: Optional[str] = None
+
+    def view(self) -> Dict[str, Any]:
+        now = time.time()
+        out: Dict[str, Any] = {
+            "id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "priority": self.priority,
+            "tasks_done": self.tasks_done,
+            "wait_s": round((self.started_at or now) - self.created_at, 3),
+        }
+        if self.started_at is not None:
+            out["run_s"] = round((self.finished_at or now) - self.started_at, 3)
+        if self.result is not None:
+            out["timings"] = self.result.get("timings", {})
+            out["final_report"] = self.result.get("final_report", "")
+            out["cached"] = self.result.get("cached", False)
+            run_id = self.result.get("run_id")
+            if run_id:
+                out["run_id"] = run_id
+            if self.status == "blocked":
+                out["safety"] = self.result.get("safety", {})
+            deadline = self.result.get("deadline")
+            if deadline:
+                out["degraded"] = deadline.get("degraded", False)
+                out["cutoff_tasks"] = deadline.get("cutoff_tasks", [])
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class JobQueue:
+    # Bounded priority queue (lower number runs first, FIFO within a priority) drained
+    # by a fixed pool of pipeline workers, so bursts queue up instead of fanning out
+    # into unbounded upstream calls.
+    def __init__(self, controller, workers: int, max_queue: int, retention_s: float, max_retained: int):
+        self.controller = controller
+        self.workers = workers
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=max_queue)
+        self.retention_s = retention_s
+        self.max_retained = max_retained
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        # finished job ids in finishing order, so pruning never stalls behind a running job
+        self.finished: "OrderedDict[str, None]" = OrderedDict()
+        self.seq = itertools.count()
+        self.tasks: List[asyncio.Task] = []
+        self.recent_run_s: List[float] = []
+
+    def start(self):
+        if not self.tasks:
+            self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for t in self.tasks:
+            t.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def retry_after_s(self) -> int:
+        # a queue slot frees each time a worker picks up a job: about one run time over the pool
+        runs = self.recent_run_s or [30.0]
+        return max(1, round(sum(runs) / len(runs) / self.workers))
+
+    def submit(self, prompt: str, priority: int = 5, use_cache: bool = True, deadline_s: Optional[float] = None) -> Job:
+        self._prune()
+        job = Job(
+            id=uuid.uuid4().hex,
+            prompt=prompt,
+            priority=priority,
+            use_cache=use_cache,
+            trace_id=trace_id_var.get(),
+            deadline_s=deadline_s,
+        )
+        try:
+            self.queue.put_nowait((priority, next(self.seq), job))
+        except asyncio.QueueFull:
+            JOBS.inc(outcome="rejected")
+            raise QueueFull(self.retry_after_s())
+        self.jobs[job.id] = job
+        JOB_QUEUE_DEPTH.set(self.queue.qsize())
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._prune()
+        return self.jobs.get(job_id)
+
+    def _prune(self):
+        now = time.time()
+        while self.finished:
+            job = self.jobs[next(iter(self.finished))]
+            if now - job.finished_at > self.retention_s or len(self.jobs) > self.max_retained:
+                self.finished.popitem(last=False)
+                del self.jobs[job.id]
+            else:
+                break
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self.queue.get()
+            JOB_QUEUE_DEPTH.set(self.queue.qsize())
+            try:
+                with JOB_WORKERS_BUSY.track():
+                    await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job: Job):
+        token = trace_id_var.set(job.trace_id)
+        job.status = job.stage = "running"
+        job.started_at = time.time()
+        JOB_WAIT_SECONDS.observe(job.started_at - job.created_at)
+        try:
+            # the deadline covers the run itself, not the time spent queued
+            async for event, payload in self.controller.stream_pipeline(
+                job.prompt, use_cache=job.use_cache, deadline_s=job.deadline_s
+            ):
+                job.stage = event
+                if event == "task":
+                    job.tasks_done += 1
+                elif event in ("done", "blocked"):
+                    # retained for job.retention_s, so kept in the compact form
+                    job.result = RunState.from_dict(payload)
+                    job.status = event
+        except Exception as e:
+            logger.exception("Job failed | id=%s", job.id)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            self.finished[job.id] = None
+            if job.status == "running":
+                job.status = "failed"
+                job.error = job.error or "pipeline ended without a result"
+            self.recent_run_s = (self.recent_run_s + [job.finished_at - job.started_at])[-50:]
+            JOBS.inc(outcome=job.status)
+            trace_id_var.reset(token)
+            self._prune()
+            # and again once this job expires, so an idle queue lets go of its results too
+            asyncio.get_running_loop().call_later(self.retention_s + 1, self._prune)
@@ -0,0 +1,142 @@
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+WHITESPACE = " \t\r\n"
+
+
+# Parses a top-level JSON object as it streams in. feed() returns events as soon as
+# they are complete: ("value", key, value) for each top-level member, ("item", key,
+# element) for each element of the arrays named in array_keys, and ("end", key, None)
+# when such an array closes. Anything before the opening brace (e.g. a ```json fence)
+# is skipped.
+class IncrementalJSONObject:
+    def __init__(self, array_keys: Iterable[str] = ()):
+        self.array_keys = set(array_keys)
+        self.buf = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_str = False
+        self.esc = False
+        self.done = False
+
+        self.key: Optional[str] = None
+        self.expect_key = True
+        self.key_start: Optional[int] = None
+        self.value_start: Optional[int] = None
+        self.in_array = False
+        self.item_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Optional[str], Any]]:
+        out: List[Tuple[str, Optional[str], Any]] = []
+        self.buf += chunk
+        buf = self.buf
+        i = self.pos
+        n = len(buf)
+
+        while i < n and not self.done:
+            ch = buf[i]
+
+            if self.in_str:
+                if self.esc:
+                    self.esc = False
+                elif ch == "\\":
+                    self.esc = True
+                elif ch == '"':
+                    self.in_str = False
+                    self._string_closed(i, out)
+                i += 1
+                continue
+
+            if self.depth == 0:
+                if ch == "{":
+                    self.depth = 1
+                i += 1
+                continue
+
+            if ch == '"':
+                self.in_str = True
+                if self.depth == 1:
+                    if self.expect_key:
+                        self.key_start = i
+                    elif self.value_start is None:
+                        self.value_start = i
+                elif self.depth == 2 and self.in_array and self.item_start is None:
+                    self.item_start = i
+            elif ch in "{[":
+                if self.depth == 1 and self.value_start is None:
+                    self.value_start = i
+                    self.in_array = ch == "[" and self.key in self.array_keys
+                elif self.depth == 2 and self.in_array and self.item_start is None:
+                    self.item_start = i
+                self.depth += 1
+            elif ch in "}]":
+                if self.depth == 2 and self.in_array and self.item_start is not None:
+                    # scalar element right before the closing bracket
+                    self._emit_item(buf[self.item_start:i], out)
+                if self.depth == 1:
+                    self._emit_scalar(i, out)
+                    self.done = True
+                    i += 1
+                    continue
+                self.depth -= 1
+                if self.depth == 2 and self.in_array and self.item_start is not None:
+                    self._emit_item(buf[self.item_start:i + 1], out)
+                elif self.depth == 1:
+                    if self.in_array:
+                        out.append(("end", self.key, None))
+                    else:
+                        out.append(("value", self.key, self._loads(buf[self.value_start:i + 1])))
+                    self._reset_member()
+            elif ch == ",":
+                if self.depth == 1:
+                    self._emit_scalar(i, out)
+                    self._reset_member()
+                elif self.depth == 2 and self.in_array and self.item_start is not None:
+                    self._emit_item(buf[self.item_start:i], out)
+            elif ch == ":":
+                if self.depth == 1:
+                    self.expect_key = False
+            elif ch not in WHITESPACE:
+                if self.depth == 1 and not self.expect_key and self.value_start is None:
+                    self.value_start = i
+                elif self.depth == 2 and self.in_array and self.item_start is None:
+                    self.item_start = i
+            i += 1
+
+        self.pos = i
+        return out
+
+    def _string_closed(self, i: int, out):
+        if self.depth == 1:
+            if self.expect_key and self.key_start is not None:
+                self.key = self._loads(self.buf[self.key_start:i + 1])
+                self.key_start = None
+            elif self.value_start is not None:
+                out.append(("value", self.key, self._loads(self.buf[self.value_start:i + 1])))
+                self.value_start = None
+                self.key = None
+        elif self.depth == 2 and self.in_array and self.item_start is not None:
+            self._emit_item(self.buf[self.item_start:i + 1], out)
+
+    def _emit_scalar(self, i: int, out):
+        if self.value_start is not None and self.key is not None:
+            out.append(("value", self.key, self._loads(self.buf[self.value_start:i])))
+
+    def _emit_item(self, raw: str, out):
+        self.item_start = None
+        value = self._loads(raw)
+        if value is not None:
+            out.append(("item", self.key, value))
+
+    def _reset_member(self):
+        self.key = None
+        self.expect_key = True
+        self.value_start = None
+        self.in_array = False
+        self.item_start = None
+
+    def _loads(self, raw: str):
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
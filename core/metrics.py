@@ -0,0 +1,236 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# In-process metrics rendered in the Prometheus text format (served on /metrics).
+# Values are per worker process; scrape each worker or aggregate downstream.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+trace_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("trace_id", default="-")
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self.lock:
+            for key, v in sorted(self.values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {v}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels):
+        self.inc(1, **labels)
+        try:
+            yield
+        finally:
+            self.dec(1, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # per label set: [count per bucket..., +Inf count], sum
+        self.series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            counts, total = series
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels):
+        # labels["outcome"] is filled in when the histogram has that label
+        t = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except (GeneratorExit, asyncio.CancelledError):
+            outcome = "cancelled"
+            raise
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            if "outcome" in self.labelnames:
+                labels["outcome"] = outcome
+            self.observe(time.perf_counter() - t, **labels)
+
+    def count(self, **labels) -> int:
+        series = self.series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self.lock:
+            for key, (counts, total) in sorted(self.series.items()):
+                running = 0
+                for upper, c in zip(self.buckets + ("+Inf",), counts):
+                    running += c
+                    le = _labels(self.labelnames, key, f'le="{upper}"')
+                    lines.append(f"{self.name}_bucket{le} {running}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total[0]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {running}")
+        return lines
+
+
+REGISTRY: List[Metric] = []
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = Histogram(
+    "research_stage_seconds", "Wall time of each pipeline stage.", ("stage",))
+UPSTREAM_SECONDS = Histogram(
+    "research_upstream_seconds", "Latency of each upstream API call.", ("upstream", "op", "outcome"))
+SEMAPHORE_WAIT_SECONDS = Histogram(
+    "research_semaphore_wait_seconds", "Time spent queued for an explorer concurrency slot.", ("op",))
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "research_rate_limit_wait_seconds", "Time a call waited on its upstream's client-side rate limiter.", ("upstream",))
+
+RUNS = Counter("research_runs_total", "Pipeline runs by outcome.", ("outcome",))
+BATCH_SAVED = Counter(
+    "research_batch_saved_total", "Upstream work skipped by sharing exploration across a batch.", ("kind",))
+RUN_STORE_WRITES = Counter(
+    "research_run_store_writes_total", "Finished runs handed to the run store, by outcome.", ("outcome",))
+REFRESHES = Counter(
+    "research_refreshes_total", "Report refreshes by how much had to be re-summarized.", ("result",))
+DEADLINE_CUTOFFS = Counter(
+    "research_deadline_cutoffs_total", "Work cut short by a request deadline, by pipeline stage.", ("stage",))
+SCHEDULER_STOPS = Counter(
+    "research_scheduler_stops_total", "Iterative exploration runs by the reason they stopped deepening.", ("reason",))
+SCHEDULER_FOLLOWUPS = Counter(
+    "research_scheduler_followups_total", "Follow-up objectives explored, by the coverage gap that queued them.", ("gap",))
+RUNS_IN_FLIGHT = Gauge("research_runs_in_flight", "Pipeline runs currently executing.")
+EVIDENCE_ITEMS = Counter("research_evidence_items_total", "Evidence items handed to the summarizer.")
+EVIDENCE_BYTES = Counter("research_evidence_bytes_total", "UTF-8 bytes of evidence quotes handed to the summarizer.")
+TOKENS = Counter("research_llm_tokens_total", "LLM tokens reported by the response usage.", ("kind",))
+CACHE_LOOKUPS = Counter("research_cache_lookups_total", "Cache lookups by cache and result.", ("cache", "result"))
+UPSTREAM_RETRIES = Counter(
+    "research_upstream_retries_total", "Upstream calls retried after a retryable error.", ("upstream", "op", "reason"))
+UPSTREAM_HEDGES = Counter(
+    "research_upstream_hedges_total", "Hedged duplicate calls started, and how many of them won.", ("upstream", "op", "result"))
+JOBS = Counter("research_jobs_total", "Background jobs by final status (rejected = queue full).", ("outcome",))
+JOB_QUEUE_DEPTH = Gauge("research_job_queue_depth", "Jobs waiting for a pipeline worker.")
+JOB_WORKERS_BUSY = Gauge("research_job_workers_busy", "Pipeline workers currently running a job.")
+JOB_WAIT_SECONDS = Histogram("research_job_wait_seconds", "Time a job spent queued before a worker picked it up.")
+SAFETY_BLOCKS = Counter("research_safety_blocks_total", "Safety guard blocks and flagged excerpts.", ("stage",))
+
+
+def record_usage(usage):
+    if usage is None:
+        return
+    for kind in ("input_tokens", "output_tokens"):
+        n = getattr(usage, kind, None)
+        if n:
+            TOKENS.inc(n, kind=kind.split("_")[0])
+
+
+@contextmanager
+def stage(timings: Dict[str, float], name: str):
+    # records the stage in the histogram and in the per-run timings dict
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timings[f"{name}_s"] = round(elapsed, 3)
+
+
+def install_trace_logging(fmt: Optional[str] = None):
+    # every LogRecord gets .trace_id from the current context, whichever handler formats it
+    factory = logging.getLogRecordFactory()
+    if getattr(factory, "adds_trace_id", False):
+        return
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        record.trace_id = trace_id_var.get()
+        return record
+
+    record_factory.adds_trace_id = True
+    logging.setLogRecordFactory(record_factory)
+    if fmt:
+        for handler in logging.getLogger().handlers:
+            handler.setFormatter(logging.Formatter(fmt))
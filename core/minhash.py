@@ -0,0 +1,74 @@
+from typing import Dict, List, Sequence, Set
+
+from core.text import TOKEN_RE
+
+MASK = (1 << 61) - 1
+EMPTY = MASK
+
+
+def shingles(text: str, k: int = 3) -> Set[int]:
+    words = TOKEN_RE.findall((text or "").lower())
+    if len(words) < k:
+        return {hash(" ".join(words)) & MASK} if words else set()
+    return {hash(" ".join(words[i:i + k])) & MASK for i in range(len(words) - k + 1)}
+
+
+def signature(hashes: Set[int], num_perm: int) -> List[int]:
+    # one-permutation hashing: one hash per shingle, min per bin, empty bins borrow
+    # from the next filled bin so every signature has num_perm comparable slots
+    sig = [EMPTY] * num_perm
+    for h in hashes:
+        b = h % num_perm
+        v = h // num_perm
+        if v < sig[b]:
+            sig[b] = v
+    if EMPTY in sig and any(v != EMPTY for v in sig):
+        for i in range(num_perm):
+            if sig[i] == EMPTY:
+                j = (i + 1) % num_perm
+                while sig[j] == EMPTY:
+                    j = (j + 1) % num_perm
+                sig[i] = sig[j] + (j - i) % num_perm
+    return sig
+
+
+def near_duplicate_groups(
+    texts: Sequence[str],
+    threshold: float,
+    num_perm: int = 64,
+    bands: int = 16,
+    shingle_size: int = 3,
+) -> List[List[int]]:
+    # LSH over the signatures gives candidate pairs in roughly linear time; each pair is
+    # confirmed with the exact shingle Jaccard before the two texts are merged
+    rows = num_perm // bands
+    sets = [shingles(t, shingle_size) for t in texts]
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets: Dict[tuple, List[int]] = {}
+    for i, sh in enumerate(sets):
+        if not sh:
+            continue
+        sig = signature(sh, num_perm)
+        for b in range(bands):
+            members = buckets.setdefault((b, *sig[b * rows:(b + 1) * rows]), [])
+            # a few representatives per bucket keep pathological buckets from going quadratic
+            for j in members[:8]:
+                ri, rj = find(i), find(j)
+                if ri == rj:
+                    break
+                if len(sh & sets[j]) / len(sh | sets[j]) >= threshold:
+                    parent[ri] = rj
+                    break
+            members.append(i)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(texts)):
+        groups.setdefault(find(i), []).append(i)
+    return sorted(groups.values(), key=lambda g: g[0])
@@ -1,4 +1,6 @@
-from typing import Any, Dict, List
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, Union
 
 
 def init_state(prompt: str) -> Dict[str, Any]:
@@ -10,4 +12,253 @@ def init_state(prompt: str) -> Dict[str, Any]:
         "evidence": [],       # list of {agent, url, excerpts}
         "summary_structured": {},
         "final_report": "",
-    }
\ No newline at end of file
+    }
+
+
+# A run works on the plain dict above; RunState is the compact form kept once a run is
+# finished (report cache, job results). Both convert to each other without loss.
+
+class AgentTag(IntEnum):
+    GENERAL = 0
+    RESEARCH = 1
+    INDUSTRY = 2
+
+
+Tag = Union[AgentTag, str, None]
+TAGS = {t.name.lower(): t for t in AgentTag}
+
+# summary keys whose values are URLs (lists or single strings)
+SUMMARY_URL_KEYS = ("sources", "references", "source")
+
+
+def encode_tag(tag) -> Tag:
+    # the planner's three tags become enums; anything else is kept as given
+    return TAGS.get(tag, tag) if isinstance(tag, str) else tag
+
+
+def decode_tag(tag: Tag):
+    return tag.name.lower() if isinstance(tag, AgentTag) else tag
+
+
+class UrlTable:
+    # per-run URL intern table: each distinct URL is stored once and referenced by id
+    __slots__ = ("urls", "ids")
+
+    def __init__(self, urls: Optional[List[str]] = None):
+        self.urls: List[str] = list(urls or [])
+        self.ids: Dict[str, int] = {u: i for i, u in enumerate(self.urls)}
+
+    def intern(self, url) -> Optional[int]:
+        if url is None:
+            return None
+        i = self.ids.get(url)
+        if i is None:
+            i = self.ids[url] = len(self.urls)
+            self.urls.append(url)
+        return i
+
+    def url(self, i: Optional[int]):
+        return None if i is None else self.urls[i]
+
+    def canonical(self, url):
+        # the table's own copy, so repeated URLs elsewhere share one string object
+        return url if not isinstance(url, str) else self.urls[self.intern(url)]
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+
+def intern_summary(obj, urls: UrlTable):
+    if isinstance(obj, dict):
+        out = {}
+        for k, v in obj.items():
+            if k in SUMMARY_URL_KEYS and isinstance(v, list):
+                out[k] = [urls.canonical(u) for u in v]
+            elif k in SUMMARY_URL_KEYS and isinstance(v, str):
+                out[k] = urls.canonical(v)
+            else:
+                out[k] = intern_summary(v, urls)
+        return out
+    if isinstance(obj, list):
+        return [intern_summary(v, urls) for v in obj]
+    return obj
+
+
+@dataclass(slots=True)
+class Task:
+    task: Any
+    tag: Tag
+    extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Task":
+        extra = {k: v for k, v in d.items() if k not in ("task", "tag")}
+        return cls(d.get("task"), encode_tag(d.get("tag")), extra or None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"task": self.task, "tag": decode_tag(self.tag), **(self.extra or {})}
+
+
+@dataclass(slots=True)
+class SearchLog:
+    agent: Tag
+    objective: Any
+    urls: List[Optional[int]]
+    extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any], urls: UrlTable) -> "SearchLog":
+        extra = {k: v for k, v in d.items() if k not in ("agent", "objective", "urls")}
+        return cls(encode_tag(d.get("agent")), d.get("objective"), [urls.intern(u) for u in d.get("urls") or []], extra or None)
+
+    def to_dict(self, urls: UrlTable) -> Dict[str, Any]:
+        return {
+            "agent": decode_tag(self.agent),
+            "objective": self.objective,
+            "urls": [urls.url(i) for i in self.urls],
+            **(self.extra or {}),
+        }
+
+
+@dataclass(slots=True)
+class Evidence:
+    agent: Tag
+    url: Optional[int]
+    quote: Any
+    agents: Optional[List[Tag]] = None          # every task that found this excerpt
+    also_sources: Optional[List[Optional[int]]] = None  # near-duplicate copies elsewhere
+    extra: Optional[Dict[str, Any]] = None      # tier, fetched_at, ...
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any], urls: UrlTable) -> "Evidence":
+        extra = {k: v for k, v in d.items() if k not in ("agent", "url", "quote", "agents", "also_sources")}
+        agents = d.get("agents")
+        also = d.get("also_sources")
+        return cls(
+            encode_tag(d.get("agent")),
+            urls.intern(d.get("url")),
+            d.get("quote"),
+            [encode_tag(a) for a in agents] if agents is not None else None,
+            [urls.intern(u) for u in also] if also is not None else None,
+            extra or None,
+        )
+
+    def to_dict(self, urls: UrlTable) -> Dict[str, Any]:
+        d = {"agent": decode_tag(self.agent), "url": urls.url(self.url), "quote": self.quote}
+        if self.agents is not None:
+            d["agents"] = [decode_tag(a) for a in self.agents]
+        if self.also_sources is not None:
+            d["also_sources"] = [urls.url(i) for i in self.also_sources]
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+
+# the typed fields of RunState; None marks a key the dict did not have
+STATE_FIELDS = ("prompt", "plan", "tasks", "search_log", "evidence", "summary_structured", "final_report")
+
+
+@dataclass(slots=True)
+class RunState:
+    prompt: Optional[str] = None
+    plan: Optional[List[Any]] = None
+    tasks: Optional[List[Task]] = None
+    search_log: Optional[List[SearchLog]] = None
+    evidence: Optional[List[Evidence]] = None
+    summary_structured: Optional[Dict[str, Any]] = None
+    final_report: Optional[str] = None
+    urls: UrlTable = field(default_factory=UrlTable)
+    extra: Dict[str, Any] = field(default_factory=dict)   # timings, stats, safety, deadline, ...
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "RunState":
+        urls = UrlTable()
+        s = cls(urls=urls, extra={k: v for k, v in d.items() if k not in STATE_FIELDS})
+        s.prompt = d.get("prompt")
+        s.plan = d.get("plan")
+        s.final_report = d.get("final_report")
+        if "tasks" in d:
+            s.tasks = [Task.from_dict(t) for t in d["tasks"] or []]
+        if "search_log" in d:
+            s.search_log = [SearchLog.from_dict(l, urls) for l in d["search_log"] or []]
+        if "evidence" in d:
+            s.evidence = [Evidence.from_dict(e, urls) for e in d["evidence"] or []]
+        if "summary_structured" in d:
+            s.summary_structured = intern_summary(d["summary_structured"], urls)
+        return s
+
+    def to_dict(self) -> Dict[str, Any]:
+        d: Dict[str, Any] = {}
+        if self.prompt is not None:
+            d["prompt"] = self.prompt
+        if self.plan is not None:
+            d["plan"] = self.plan
+        if self.tasks is not None:
+            d["tasks"] = [t.to_dict() for t in self.tasks]
+        if self.search_log is not None:
+            d["search_log"] = [l.to_dict(self.urls) for l in self.search_log]
+        if self.evidence is not None:
+            d["evidence"] = [e.to_dict(self.urls) for e in self.evidence]
+        if self.summary_structured is not None:
+            d["summary_structured"] = self.summary_structured
+        if self.final_report is not None:
+            d["final_report"] = self.final_report
+        d.update(self.extra)
+        return d
+
+    def get(self, key: str, default=None):
+        # dict-style read of a single key without rebuilding the whole dict
+        if key in STATE_FIELDS:
+            value = getattr(self, key)
+            if value is None:
+                return default
+            if key == "tasks":
+                return [t.to_dict() for t in value]
+            if key in ("search_log", "evidence"):
+                return [item.to_dict(self.urls) for item in value]
+            return value
+        return self.extra.get(key, default)
+
+    def to_compact(self) -> Dict[str, Any]:
+        # JSON-ready form: URLs listed once, records as positional arrays, tags as ints
+        c: Dict[str, Any] = {"v": 1, "urls": self.urls.urls}
+        if self.prompt is not None:
+            c["prompt"] = self.prompt
+        if self.plan is not None:
+            c["plan"] = self.plan
+        if self.tasks is not None:
+            c["tasks"] = [[t.task, t.tag, t.extra] for t in self.tasks]
+        if self.search_log is not None:
+            c["log"] = [[l.agent, l.objective, l.urls, l.extra] for l in self.search_log]
+        if self.evidence is not None:
+            c["ev"] = [[e.agent, e.url, e.quote, e.agents, e.also_sources, e.extra] for e in self.evidence]
+        if self.summary_structured is not None:
+            c["summary"] = self.summary_structured
+        if self.final_report is not None:
+            c["report"] = self.final_report
+        if self.extra:
+            c["extra"] = self.extra
+        return c
+
+    @classmethod
+    def from_compact(cls, c: Dict[str, Any]) -> "RunState":
+        def tag(t):
+            return AgentTag(t) if isinstance(t, int) and not isinstance(t, bool) else t
+
+        urls = UrlTable(c.get("urls"))
+        s = cls(urls=urls, extra=c.get("extra") or {})
+        s.prompt = c.get("prompt")
+        s.plan = c.get("plan")
+        s.final_report = c.get("report")
+        if "tasks" in c:
+            s.tasks = [Task(task, tag(t), extra) for task, t, extra in c["tasks"]]
+        if "log" in c:
+            s.search_log = [SearchLog(tag(a), objective, ids, extra) for a, objective, ids, extra in c["log"]]
+        if "ev" in c:
+            s.evidence = [
+                Evidence(tag(a), url, quote, [tag(x) for x in agents] if agents is not None else None, also, extra)
+                for a, url, quote, agents, also, extra in c["ev"]
+            ]
+        if "summary" in c:
+            s.summary_structured = intern_summary(c["summary"], urls)
+        return s
@@ -0,0 +1,142 @@
+import math
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlparse
+
+from core.text import BM25, tokenize
+
+# length of json.dumps({"agent": "", "url": "", "quote": ""}); escapes are added per item
+ITEM_OVERHEAD = 37
+
+
+def item_size(item: Dict[str, str]) -> int:
+    q = item["quote"]
+    escapes = q.count('"') + q.count("\\") + q.count("\n")
+    return ITEM_OVERHEAD + len(item["agent"]) + len(item["url"]) + len(q) + escapes
+
+
+def pack_evidence(
+    prompt: str,
+    evidence: List[Dict[str, Any]],
+    max_items: int,
+    max_chars: int,
+    tag_min_share: float = 0.0,
+    granularity: int = 50,
+    knapsack: bool = True,
+) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+    # Rank by BM25 against the prompt, reserve a few top items per agent tag, then fill
+    # the rest of the character budget as a 0/1 knapsack (value = relevance), or
+    # greedily by rank when knapsack is off (large budgets).
+    items = []
+    for e in evidence:
+        item = {
+            "agent": e.get("agent", "") or "",
+            "url": e.get("url", "") or "",
+            "quote": (e.get("quote", "") or "").strip(),
+        }
+        if item["quote"]:
+            items.append(item)
+    if not items or max_items <= 0 or max_chars <= 0:
+        return [], {"candidates": len(items), "selected": 0, "chars": 0}
+
+    sizes = [item_size(it) for it in items]
+    bm25 = BM25([tokenize(it["quote"]) for it in items])
+    # a small floor keeps off-topic but cheap items usable as filler
+    scores = [s + 1e-3 for s in bm25.scores(tokenize(prompt))]
+    order = sorted(range(len(items)), key=lambda i: scores[i], reverse=True)
+
+    chosen = set()
+    used = 0
+    by_tag: Dict[str, List[int]] = {}
+    for i in order:
+        by_tag.setdefault(items[i]["agent"], []).append(i)
+    # each tag may reserve up to tag_min_share of both the item and the char budget
+    share = tag_min_share if len(by_tag) > 1 else 0.0
+    quota_items = math.floor(max_items * share)
+    quota_chars = max_chars * share
+    for idxs in by_tag.values():
+        taken = tag_chars = 0
+        for i in idxs:
+            if taken >= quota_items or len(chosen) >= max_items:
+                break
+            if tag_chars + sizes[i] <= quota_chars:
+                chosen.add(i)
+                used += sizes[i]
+                tag_chars += sizes[i]
+                taken += 1
+
+    rest = [i for i in order if i not in chosen and sizes[i] <= max_chars - used]
+    if knapsack:
+        capacity = (max_chars - used) // granularity
+        picked = _knapsack(rest, [math.ceil(sizes[i] / granularity) for i in rest], scores, capacity)
+    else:
+        picked, room_chars = [], max_chars - used
+        for i in rest:
+            if sizes[i] <= room_chars:
+                picked.append(i)
+                room_chars -= sizes[i]
+
+    room = max_items - len(chosen)
+    if len(picked) > room:
+        picked = sorted(picked, key=lambda i: scores[i], reverse=True)[:room]
+    for i in picked:
+        chosen.add(i)
+        used += sizes[i]
+
+    selected = sorted(chosen, key=lambda i: scores[i], reverse=True)
+    stats = {
+        "candidates": len(items),
+        "selected": len(selected),
+        "chars": used,
+        "tags": {tag: sum(1 for i in selected if items[i]["agent"] == tag) for tag in by_tag},
+    }
+    return [items[i] for i in selected], stats
+
+
+def shard_evidence(items: List[Dict[str, str]], shard_chars: int, by: str = "tag") -> List[List[Dict[str, str]]]:
+    # by "tag": one or more shards per agent tag; by "url": items from the same host stay
+    # adjacent and hosts are packed together. No shard exceeds shard_chars.
+    groups: Dict[str, List[Dict[str, str]]] = {}
+    for it in items:
+        key = it["agent"] if by == "tag" else urlparse(it["url"]).netloc
+        groups.setdefault(key, []).append(it)
+
+    shards = []
+    shard, size = [], 0
+    for key in sorted(groups):
+        if by == "tag" and shard:
+            shards.append(shard)
+            shard, size = [], 0
+        for it in groups[key]:
+            n = item_size(it)
+            if shard and size + n > shard_chars:
+                shards.append(shard)
+                shard, size = [], 0
+            shard.append(it)
+            size += n
+    if shard:
+        shards.append(shard)
+    return shards
+
+
+def _knapsack(idxs: List[int], weights: List[int], scores: List[float], capacity: int) -> List[int]:
+    if capacity <= 0 or not idxs:
+        return []
+    best = [0.0] * (capacity + 1)
+    keep = []
+    for k, i in enumerate(idxs):
+        w, v = weights[k], scores[i]
+        row = bytearray(capacity + 1)
+        for c in range(capacity, w - 1, -1):
+            cand = best[c - w] + v
+            if cand > best[c]:
+                best[c] = cand
+                row[c] = 1
+        keep.append(row)
+
+    out = []
+    c = capacity
+    for k in range(len(idxs) - 1, -1, -1):
+        if keep[k][c]:
+            out.append(idxs[k])
+            c -= weights[k]
+    return out
@@ -0,0 +1,214 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+
+from core.metrics import RATE_LIMIT_WAIT_SECONDS, UPSTREAM_HEDGES, UPSTREAM_RETRIES
+
+RETRYABLE_STATUS = {408, 409, 429}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError"}
+
+
+class TokenBucket:
+    # rate <= 0 disables the bucket
+    def __init__(self, rate_per_s: float, capacity: float):
+        self.rate = rate_per_s
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, n: float = 1.0) -> float:
+        if self.rate <= 0 or n <= 0:
+            return 0.0
+        # a request bigger than the bucket waits for a full bucket instead of forever
+        n = min(n, self.capacity)
+        waited = 0.0
+        # callers queue on the lock, so they are served in arrival order
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return waited
+                delay = (n - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def debit(self, n: float):
+        # settles an estimate after the fact; the balance may go negative and later callers wait
+        if self.rate <= 0:
+            return
+        self._refill()
+        self.tokens -= n
+
+
+class Budget:
+    # Every request deposits `ratio`; every retry or hedge withdraws 1. Under a broad
+    # outage the budget runs dry, so extra traffic stays at about ratio x requests.
+    def __init__(self, ratio: float, reserve: float = 10.0, cap: float = 100.0):
+        self.ratio = ratio
+        self.tokens = reserve
+        self.cap = cap
+
+    def deposit(self):
+        self.tokens = min(self.cap, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class LatencyWindow:
+    def __init__(self, size: int = 200):
+        self.samples: Dict[str, Deque[float]] = {}
+        self.size = size
+
+    def record(self, op: str, seconds: float):
+        self.samples.setdefault(op, deque(maxlen=self.size)).append(seconds)
+
+    def percentile(self, op: str, p: float, min_samples: int) -> Optional[float]:
+        window = self.samples.get(op)
+        if not window or len(window) < min_samples:
+            return None
+        values = sorted(window)
+        return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def retry_reason(e: BaseException) -> Optional[str]:
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(getattr(e, "response", None), "status_code", None)
+    if isinstance(status, int) and (status in RETRYABLE_STATUS or status >= 500):
+        return str(status)
+    if isinstance(e, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return "timeout"
+    if isinstance(e, httpx.TransportError):
+        return "connection"
+    names = {c.__name__ for c in type(e).__mro__}
+    if names & RETRYABLE_ERRORS:
+        return "timeout" if "APITimeoutError" in names else "connection"
+    return None
+
+
+def retry_after_s(e: BaseException) -> Optional[float]:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class Resilience:
+    # Client-side policy for one upstream, shared by every concurrent run:
+    # rate limiting (requests/s and tokens/min), jittered exponential backoff on
+    # retryable errors under a retry budget and a total time budget, and optional
+    # hedging of idempotent calls that run past a latency percentile.
+    def __init__(
+        self,
+        name: str,
+        *,
+        rps: float = 0,
+        burst: float = 1,
+        tpm: float = 0,
+        max_attempts: int = 4,
+        backoff_base_s: float = 0.5,
+        backoff_max_s: float = 8.0,
+        retry_budget_ratio: float = 0.2,
+        deadline_s: float = 60.0,
+        hedge_percentile: float = 0,
+        hedge_min_samples: int = 20,
+        hedge_budget_ratio: float = 0.1,
+    ):
+        self.name = name
+        self.requests = TokenBucket(rps, burst)
+        self.tokens = TokenBucket(tpm / 60.0, tpm)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.deadline_s = deadline_s
+        self.retry_budget = Budget(retry_budget_ratio)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_budget = Budget(hedge_budget_ratio)
+        self.latency = LatencyWindow()
+        self.rng = random.Random()
+
+    def backoff(self, attempt: int, e: BaseException) -> float:
+        # full jitter; an explicit Retry-After from the server wins when it is longer
+        delay = self.rng.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** (attempt - 1)))
+        hinted = retry_after_s(e)
+        return max(delay, hinted) if hinted is not None else delay
+
+    async def call(self, op: str, fn: Callable[[], Awaitable[Any]], tokens: float = 0, hedge: bool = False) -> Any:
+        started = time.monotonic()
+        self.retry_budget.deposit()
+        self.hedge_budget.deposit()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                if hedge and self.hedge_percentile > 0:
+                    return await self._hedged(op, fn, tokens)
+                return await self._once(op, fn, tokens)
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason is None or attempt >= self.max_attempts:
+                    raise
+                delay = self.backoff(attempt, e)
+                if time.monotonic() - started + delay > self.deadline_s or not self.retry_budget.withdraw():
+                    raise
+                UPSTREAM_RETRIES.inc(upstream=self.name, op=op, reason=reason)
+                await asyncio.sleep(delay)
+
+    async def _once(self, op: str, fn: Callable[[], Awaitable[Any]], tokens: float) -> Any:
+        waited = await self.requests.acquire(1)
+        waited += await self.tokens.acquire(tokens)
+        RATE_LIMIT_WAIT_SECONDS.observe(waited, upstream=self.name)
+        t = time.perf_counter()
+        result = await fn()
+        self.latency.record(op, time.perf_counter() - t)
+        return result
+
+    async def _hedged(self, op: str, fn: Callable[[], Awaitable[Any]], tokens: float) -> Any:
+        threshold = self.latency.percentile(op, self.hedge_percentile, self.hedge_min_samples)
+        primary = asyncio.ensure_future(self._once(op, fn, tokens))
+        if threshold is None:
+            return await primary
+
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=threshold)
+            if done or not self.hedge_budget.withdraw():
+                return await primary
+
+            UPSTREAM_HEDGES.inc(upstream=self.name, op=op, result="started")
+            backup = asyncio.ensure_future(self._once(op, fn, tokens))
+            tasks.append(backup)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for d in done:
+                    if d.exception() is None:
+                        if d is backup:
+                            UPSTREAM_HEDGES.inc(upstream=self.name, op=op, result="won")
+                        return d.result()
+            # both copies failed: surface the primary's error to the retry loop
+            raise primary.exception()
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    def settle(self, estimated: float, actual: Optional[float]):
+        if actual is not None:
+            self.tokens.debit(actual - estimated)
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional
+
+from core.cache import normalize_prompt
+from core.metrics import RUN_STORE_WRITES
+
+logger = logging.getLogger("runstore")
+
+# evidence keys that get their own columns; anything else goes to the row's `extra`
+EVIDENCE_COLUMNS = ("agent", "url", "quote", "tier")
+# state keys kept out of the compressed body: stored as columns/rows or not worth keeping
+BODY_SKIP = ("prompt", "evidence", "final_report", "cached", "run_id", "created_at", "status")
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS runs ("
+    " id TEXT PRIMARY KEY,"
+    " prompt TEXT NOT NULL,"
+    " prompt_key TEXT NOT NULL,"
+    " created_at REAL NOT NULL,"
+    " status TEXT NOT NULL,"
+    " evidence_count INTEGER NOT NULL,"
+    " trace_id TEXT,"
+    " report BLOB NOT NULL,"
+    " body BLOB NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS urls (id INTEGER PRIMARY KEY, url TEXT NOT NULL UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS evidence ("
+    " run_id TEXT NOT NULL,"
+    " seq INTEGER NOT NULL,"
+    " url_id INTEGER,"
+    " agent TEXT,"
+    " tier TEXT,"
+    " quote TEXT,"
+    " extra TEXT,"
+    " PRIMARY KEY (run_id, seq))",
+    "CREATE INDEX IF NOT EXISTS runs_created ON runs(created_at, id)",
+    "CREATE INDEX IF NOT EXISTS runs_prompt ON runs(prompt_key, created_at)",
+    "CREATE INDEX IF NOT EXISTS evidence_url ON evidence(url_id)",
+)
+
+
+def pack(value) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def unpack(raw: bytes):
+    return json.loads(zlib.decompress(raw).decode("utf-8"))
+
+
+def run_status(state: Dict[str, Any]) -> str:
+    if state.get("safety", {}).get("blocked"):
+        return "blocked"
+    if (state.get("deadline") or {}).get("degraded"):
+        return "degraded"
+    return "done"
+
+
+class RunStore:
+    # Finished runs in SQLite: one row per run (compressed report and state body),
+    # evidence as rows against a shared URL table. record() only enqueues; a single
+    # background writer does serialization and I/O off the event loop, so persisting
+    # a run never adds to request latency.
+    def __init__(self, path: str, max_queue: int, retention_days: float):
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        for stmt in SCHEMA:
+            self.conn.execute(stmt)
+        self.conn.commit()
+        self.retention_s = retention_days * 86400
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.task: Optional[asyncio.Task] = None
+        self.writes = 0
+
+    def record(self, prompt: str, state: Dict[str, Any], trace_id: Optional[str] = None) -> Optional[str]:
+        run_id = uuid.uuid4().hex
+        if self.task is None:
+            self.task = asyncio.create_task(self._writer())
+        try:
+            # finished states are not mutated afterwards, a shallow copy is enough
+            self.queue.put_nowait((run_id, time.time(), trace_id, {**state, "prompt": prompt}))
+        except asyncio.QueueFull:
+            RUN_STORE_WRITES.inc(outcome="dropped")
+            logger.warning("Run store queue full, run not persisted | prompt=%r", prompt[:80])
+            return None
+        return run_id
+
+    async def _writer(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                await asyncio.to_thread(self._write, *item)
+                RUN_STORE_WRITES.inc(outcome="ok")
+            except Exception:
+                RUN_STORE_WRITES.inc(outcome="error")
+                logger.exception("Run store write failed | id=%s", item[0])
+            finally:
+                self.queue.task_done()
+
+    async def stop(self):
+        if self.task is None:
+            return
+        # flush what is queued, then stop the writer
+        await self.queue.join()
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    def _write(self, run_id: str, created_at: float, trace_id: Optional[str], state: Dict[str, Any]):
+        prompt = state.get("prompt", "")
+        evidence = state.get("evidence", []) or []
+        body = pack({k: v for k, v in state.items() if k not in BODY_SKIP})
+        report = zlib.compress((state.get("final_report") or "").encode("utf-8"))
+        with self.lock:
+            url_ids = self._url_ids({e.get("url") for e in evidence if e.get("url")})
+            rows = []
+            for seq, e in enumerate(evidence):
+                extra = {k: v for k, v in e.items() if k not in EVIDENCE_COLUMNS}
+                rows.append((
+                    run_id, seq, url_ids.get(e.get("url")), e.get("agent"), e.get("tier"), e.get("quote"),
+                    json.dumps(extra, ensure_ascii=False, separators=(",", ":")) if extra else None,
+                ))
+            self.conn.execute(
+                "INSERT INTO runs (id, prompt, prompt_key, created_at, status, evidence_count, trace_id, report, body)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, prompt, normalize_prompt(prompt), created_at, run_status(state), len(evidence), trace_id,
+                 report, body),
+            )
+            self.conn.executemany("INSERT INTO evidence VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self.writes += 1
+            if self.retention_s > 0 and self.writes % 100 == 1:
+                self._prune(time.time() - self.retention_s)
+            self.conn.commit()
+
+    def _url_ids(self, urls) -> Dict[str, int]:
+        self.conn.executemany("INSERT OR IGNORE INTO urls (url) VALUES (?)", [(u,) for u in urls])
+        out = {}
+        urls = list(urls)
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            out.update(self.conn.execute(f"SELECT url, id FROM urls WHERE url IN ({marks})", chunk).fetchall())
+        return out
+
+    def _prune(self, before: float):
+        old = "SELECT id FROM runs WHERE created_at < ?"
+        self.conn.execute(f"DELETE FROM evidence WHERE run_id IN ({old})", (before,))
+        self.conn.execute("DELETE FROM runs WHERE created_at < ?", (before,))
+        # URL rows are left in place: they are small and shared across runs
+
+    def list(
+        self,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        prompt: Optional[str] = None,
+        url: Optional[str] = None,
+        since: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        # newest first; cursor is "<created_at>:<id>" of the last row of the previous page
+        where, args = [], []
+        if cursor:
+            ts, _, last_id = cursor.partition(":")
+            where.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            args += [float(ts), float(ts), last_id]
+        if prompt:
+            where.append("prompt_key = ?")
+            args.append(normalize_prompt(prompt))
+        if url:
+            where.append(
+                "id IN (SELECT e.run_id FROM evidence e JOIN urls u ON u.id = e.url_id WHERE u.url = ?)"
+            )
+            args.append(url)
+        if since is not None:
+            where.append("created_at >= ?")
+            args.append(since)
+        sql = "SELECT id, prompt, created_at, status, evidence_count, trace_id FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        with self.lock:
+            rows = self.conn.execute(sql, args + [limit + 1]).fetchall()
+        runs = [
+            {"id": r[0], "prompt": r[1], "created_at": r[2], "status": r[3], "evidence_count": r[4], "trace_id": r[5]}
+            for r in rows[:limit]
+        ]
+        next_cursor = f"{runs[-1]['created_at']!r}:{runs[-1]['id']}" if len(rows) > limit else None
+        return {"runs": runs, "next_cursor": next_cursor}
+
+    def get(self, run_id: str, evidence_limit: int = 50, evidence_offset: int = 0) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT prompt, created_at, status, evidence_count, trace_id, report, body FROM runs WHERE id = ?",
+                (run_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            evidence = self._evidence(run_id, evidence_limit, evidence_offset)
+        return {
+            "id": run_id,
+            "prompt": row[0],
+            "created_at": row[1],
+            "status": row[2],
+            "evidence_count": row[3],
+            "trace_id": row[4],
+            "final_report": zlib.decompress(row[5]).decode("utf-8"),
+            **unpack(row[6]),
+            "evidence": evidence,
+            "evidence_offset": evidence_offset,
+        }
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        # the full pipeline state of a stored run, all evidence included; created_at is kept
+        # so a refresh can tell how old the evidence is
+        run = self.get(run_id, evidence_limit=-1)
+        if run is None:
+            return None
+        for k in ("id", "evidence_count", "trace_id", "evidence_offset"):
+            run.pop(k)
+        run["run_id"] = run_id
+        return run
+
+    def latest(self, prompt: str) -> Optional[str]:
+        runs = self.list(limit=1, prompt=prompt)["runs"]
+        return runs[0]["id"] if runs else None
+
+    def _evidence(self, run_id: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        rows = self.conn.execute(
+            "SELECT e.agent, u.url, e.quote, e.tier, e.extra FROM evidence e LEFT JOIN urls u ON u.id = e.url_id"
+            " WHERE e.run_id = ? ORDER BY e.seq LIMIT ? OFFSET ?",
+            (run_id, limit, offset),
+        ).fetchall()
+        out = []
+        for agent, url, quote, tier, extra in rows:
+            e = {"agent": agent, "url": url, "quote": quote}
+            if tier is not None:
+                e["tier"] = tier
+            if extra:
+                e.update(json.loads(extra))
+            out.append(e)
+        return out
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -27,34 +27,83 @@ def blocked_prompt_response(res: SafetyResult) -> Dict:
         },
     }
 
-class PromptInjectionGuard:
-    def __init__(self):
-        self.prompt_patterns = [
-            ("ignore_prev", r"ignore (all|any|previous) (instructions|directions)"),
-            ("system_prompt", r"(reveal|show|print).{0,40}(system prompt|developer message|hidden prompt)"),
-            ("roleplay_override", r"you are (now|no longer) (chatgpt|an ai|the system)"),
-            ("tool_abuse", r"(run|execute|call) (a tool|tools|function|functions)"),
-            ("data_exfil", r"(api key|password|secret|token|credentials)"),
-            ("jailbreak", r"(jailbreak|do anything now|dan)"),
-        ]
-
-        self.plan_patterns = re.compile(
-            r"(ignore (all|previous) instructions|system prompt|developer message|"
-            r"api key|password|secret|token|jailbreak|do anything now|"
-            r"\b(run|execute|call)\b.+\b(tool|function)\b)",
-            re.IGNORECASE,
-        )
+# (name, prefilter keywords, confirming pattern). Keywords are lowercase literals; a
+# text only goes through a rule's pattern when one of its keywords occurs in it, so
+# every text a pattern matches must contain one of its keywords (benchmarks/bench_safety.py
+# checks each alternative of each pattern).
+PROMPT_RULES = [
+    ("ignore_prev", ["ignore"], r"ignore (all|any|previous) (instructions|directions)"),
+    ("system_prompt", ["system prompt", "developer message", "hidden prompt"],
+     r"(reveal|show|print).{0,40}(system prompt|developer message|hidden prompt)"),
+    ("roleplay_override", ["you are now", "you are no longer"], r"you are (now|no longer) (chatgpt|an ai|the system)"),
+    ("tool_abuse", ["tool", "function"], r"(run|execute|call) (a tool|tools|function|functions)"),
+    ("data_exfil", ["api key", "password", "secret", "token", "credentials"],
+     r"(api key|password|secret|token|credentials)"),
+    ("jailbreak", ["jailbreak", "do anything now", "dan"], r"(jailbreak|do anything now|\bdan\b)"),
+]
 
-    def _scan_text(self, text: str) -> List[Dict]:
-        hits = []
+PLAN_RULES = [
+    ("ignore_prev", ["ignore"], r"ignore (all|previous) instructions"),
+    ("system_prompt", ["system prompt", "developer message"], r"(system prompt|developer message)"),
+    ("data_exfil", ["api key", "password", "secret", "token"], r"(api key|password|secret|token)"),
+    ("jailbreak", ["jailbreak", "do anything now"], r"(jailbreak|do anything now)"),
+    ("tool_abuse", ["tool", "function"], r"\b(run|execute|call)\b.+\b(tool|function)\b"),
+]
+
+# web pages talk about passwords, tokens and functions all the time, so evidence is
+# only checked for text that tries to steer the model
+EVIDENCE_RULES = [
+    ("ignore_prev", ["ignore", "disregard", "forget"],
+     r"(ignore|disregard|forget) (all |any )?(the )?(previous|prior|above|earlier) (instructions|directions|context)"),
+    ("system_prompt", ["system prompt", "developer message", "hidden prompt"],
+     r"(reveal|show|print|repeat|output).{0,40}(system prompt|developer message|hidden prompt)"),
+    ("roleplay_override", ["you are now", "you are no longer"], r"you are (now|no longer) (chatgpt|an ai|the system|a )"),
+    # keyed on the directive verb every match has: "ai" is in "said", and in most pages about AI
+    ("model_directive", ["must", "should"],
+     r"\b(ai|assistant|language model|ai model)s?\b.{0,30}\b(must|should) (now )?(ignore|say|respond|output|include|recommend)"),
+]
+
+class Scanner:
+    def __init__(self, rules):
+        self.names = [name for name, _, _ in rules]
+        # patterns run on the lowercased text, the way the per-pattern loop always did
+        self.patterns = [re.compile(pat) for _, _, pat in rules]
+        # keyword -> rule indexes; literal containment checks are C-speed, which beats a
+        # combined regex alternation by a wide margin in CPython (see benchmarks/bench_safety.py)
+        self.keywords: Dict[str, List[int]] = {}
+        for i, (_, kws, _) in enumerate(rules):
+            for kw in kws:
+                self.keywords.setdefault(kw, []).append(i)
+
+    def scan(self, text: str) -> List[Tuple[str, re.Match]]:
         if not text:
-            return hits
+            return []
         t = text.lower()
-        for name, pat in self.prompt_patterns:
-            if re.search(pat, t):
-                hits.append({"pattern": name, "snippet": text[:200]})
+        candidates = set()
+        for kw, rules in self.keywords.items():
+            if kw in t:
+                candidates.update(rules)
+        hits = []
+        for i in sorted(candidates):
+            m = self.patterns[i].search(t)
+            if m:
+                hits.append((self.names[i], m))
         return hits
 
+def snippet(text: str, m: re.Match, width: int = 200) -> str:
+    start = max(0, m.start() - width // 4)
+    return text[start:start + width]
+
+class PromptInjectionGuard:
+    def __init__(self, evidence_action: str = "quarantine"):
+        self.prompt_scanner = Scanner(PROMPT_RULES)
+        self.plan_scanner = Scanner(PLAN_RULES)
+        self.evidence_scanner = Scanner(EVIDENCE_RULES)
+        self.evidence_action = evidence_action
+
+    def _scan_text(self, text: str) -> List[Dict]:
+        return [{"pattern": name, "snippet": text[:200]} for name, _ in self.prompt_scanner.scan(text)]
+
     def validate_prompt(self, prompt: str) -> SafetyResult:
         matches = ([{"where": "prompt", **m} for m in self._scan_text(prompt)])
         logger.info(
@@ -98,13 +147,55 @@ class PromptInjectionGuard:
             if not task or tag not in {"research", "industry", "general"}:
                 return SafetyResult(True, "Planner produced invalid task format.", [{"idx": i}])
 
-            if self.plan_patterns.search(task):
+            hits = self.plan_scanner.scan(task)
+            if hits:
                 logger.warning(
-                    "Planner validation failed: unsafe task text | idx=%d | preview=%r",
-                    i, task[:80]
+                    "Planner validation failed: unsafe task text | idx=%d | patterns=%s | preview=%r",
+                    i, [name for name, _ in hits], task[:80]
                 )
                 return SafetyResult(True, "Planner task contains unsafe instructions.", [
-                    {"idx": i, "snippet": task[:200]}
+                    {"idx": i, "pattern": name, "snippet": task[:200]} for name, _ in hits
                 ])
         logger.info("Planner validation passed")
-        return SafetyResult(False, "", [])
\ No newline at end of file
+        return SafetyResult(False, "", [])
+
+    def validate_evidence(self, state: dict) -> SafetyResult:
+        # retrieved pages are untrusted input too: injected excerpts never reach the summarizer
+        kept, flagged = [], []
+        for e in state.get("evidence", []) or []:
+            quote = e.get("quote") or ""
+            hits = self.evidence_scanner.scan(quote)
+            if not hits:
+                kept.append(e)
+                continue
+            flagged.append({
+                **e,
+                "patterns": [name for name, _ in hits],
+                "snippet": snippet(quote, hits[0][1]),
+            })
+
+        state["evidence"] = kept
+        if self.evidence_action == "quarantine":
+            state.setdefault("quarantined_evidence", []).extend(flagged)
+        state["evidence_safety"] = {
+            "scanned": len(kept) + len(flagged),
+            "flagged": len(flagged),
+            "action": self.evidence_action,
+        }
+
+        if not flagged:
+            return SafetyResult(blocked=False, reason="", matches=[])
+        logger.warning(
+            "Evidence validation: %d excerpt(s) %s | patterns=%s",
+            len(flagged),
+            "quarantined" if self.evidence_action == "quarantine" else "dropped",
+            sorted({p for f in flagged for p in f["patterns"]}),
+        )
+        return SafetyResult(
+            blocked=False,
+            reason="Possible prompt-injection detected in evidence.",
+            matches=[
+                {"where": "evidence", "url": f.get("url"), "pattern": p, "snippet": f["snippet"]}
+                for f in flagged for p in f["patterns"]
+            ][:20],
+        )
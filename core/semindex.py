@@ -0,0 +1,198 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.text import tokenize
+
+KINDS = ("prompt", "task", "evidence")
+
+
+# character 4-grams let "society" and "societal" share features; they count for less than whole words
+CHAR_GRAM_WEIGHT = 0.5
+
+
+def embed(text: str, dim: int) -> np.ndarray:
+    # signed feature hashing of word unigrams, bigrams and character 4-grams, log-scaled
+    # counts, unit length; crc32 rather than hash() so vectors stay comparable across processes
+    tokens = tokenize(text)
+    words = Counter(tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])])
+    grams = Counter(f"#{w[i:i + 4]}" for w in (f"<{t}>" for t in tokens) for i in range(len(w) - 3))
+    v = np.zeros(dim, dtype=np.float32)
+    for features, weight in ((words, 1.0), (grams, CHAR_GRAM_WEIGHT)):
+        for f, c in features.items():
+            h = zlib.crc32(f.encode("utf-8"))
+            v[h % dim] += weight * (1.0 + math.log(c)) * (1.0 if h & 0x80000000 else -1.0)
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm else v
+
+
+class VectorFile:
+    # Append-only float32 matrix in a memory-mapped file. Capacity doubles as it fills;
+    # rows past `count` are scratch space until their metadata is committed.
+    def __init__(self, path: str, dim: int, count: int):
+        self.path = path
+        self.dim = dim
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        capacity = os.path.getsize(path) // (dim * 4)
+        self.count = min(count, capacity)
+        self.mm = self._map(max(capacity, 1024))
+
+    def _map(self, capacity: int) -> np.memmap:
+        size = capacity * self.dim * 4
+        if os.path.getsize(self.path) < size:
+            with open(self.path, "r+b") as f:
+                f.truncate(size)
+        return np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def append(self, vectors: np.ndarray) -> int:
+        start = self.count
+        end = start + len(vectors)
+        if end > self.mm.shape[0]:
+            self.mm.flush()
+            self.mm = self._map(max(end, self.mm.shape[0] * 2))
+        self.mm[start:end] = vectors
+        self.mm.flush()
+        return start
+
+    def view(self) -> np.ndarray:
+        return self.mm[:self.count]
+
+
+class SemanticIndex:
+    # Local similarity index over past prompts, planner tasks and evidence excerpts.
+    # Vectors live in one memory-mapped file per kind; text, URLs and timestamps in SQLite.
+    # Adds are incremental and safe to run in a worker thread alongside queries.
+    def __init__(self, path: str, dim: int = 256):
+        os.makedirs(path, exist_ok=True)
+        self.dim = dim
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(path, "meta.sqlite3"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " kind TEXT NOT NULL,"
+            " row INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " added_at REAL NOT NULL,"
+            " text TEXT NOT NULL,"
+            " url TEXT,"
+            " agent TEXT,"
+            " ref TEXT,"           # run id for prompts
+            " task INTEGER,"       # task row an evidence excerpt was found for
+            " PRIMARY KEY (kind, row))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS items_task ON items(kind, task)")
+        self.conn.commit()
+
+        # created_at is when the text was fetched (freshness); added_at only grows with the row
+        # number, so a freshness cutoff also bounds the rows a query has to scan
+        self.vectors: Dict[str, VectorFile] = {}
+        self.times: Dict[str, np.ndarray] = {}
+        self.added: Dict[str, np.ndarray] = {}
+        for kind in KINDS:
+            rows = self.conn.execute(
+                "SELECT created_at, added_at FROM items WHERE kind = ? ORDER BY row", (kind,)
+            ).fetchall()
+            vf = VectorFile(os.path.join(path, f"{kind}.f32"), dim, len(rows))
+            # metadata without vectors (a crash between the two writes) is dropped
+            if vf.count < len(rows):
+                self.conn.execute("DELETE FROM items WHERE kind = ? AND row >= ?", (kind, vf.count))
+                self.conn.commit()
+            self.vectors[kind] = vf
+            self.times[kind] = np.asarray([r[0] for r in rows[:vf.count]], dtype=np.float64)
+            self.added[kind] = np.asarray([r[1] for r in rows[:vf.count]], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return sum(vf.count for vf in self.vectors.values())
+
+    def _add(self, kind: str, rows: Sequence[Tuple[str, float, Optional[str], Optional[str], Optional[str], Optional[int]]]) -> int:
+        # rows: (text, created_at, url, agent, ref, task); returns the first row number
+        vf = self.vectors[kind]
+        added_at = max(time.time(), self.added[kind][-1] if len(self.added[kind]) else 0.0)
+        start = vf.append(np.stack([embed(r[0], self.dim) for r in rows]))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO items (kind, row, created_at, added_at, text, url, agent, ref, task)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (kind, start + i, min(created_at, added_at), added_at, text, url, agent, ref, task)
+                for i, (text, created_at, url, agent, ref, task) in enumerate(rows)
+            ],
+        )
+        self.conn.commit()
+        vf.count = start + len(rows)
+        self.times[kind] = np.concatenate([self.times[kind], [min(r[1], added_at) for r in rows]])
+        self.added[kind] = np.concatenate([self.added[kind], np.full(len(rows), added_at)])
+        return start
+
+    def add_run(self, state: Dict[str, Any]):
+        # index a finished run; evidence that itself came from the index is not added again
+        now = time.time()
+        evidence = [e for e in state.get("evidence", []) or [] if e.get("tier") != "index" and e.get("quote")]
+        logs = [l for l in state.get("search_log", []) or [] if not l.get("index_hit") and l.get("objective")]
+        with self.lock:
+            if state.get("prompt"):
+                self._add("prompt", [(state["prompt"], now, None, None, state.get("run_id"), None)])
+            task_rows: Dict[Tuple[str, str], int] = {}
+            if logs:
+                start = self._add("task", [(l["objective"], now, None, l.get("agent"), None, None) for l in logs])
+                for i, l in enumerate(logs):
+                    for u in l.get("urls") or []:
+                        task_rows.setdefault((l.get("agent"), u), start + i)
+            if evidence:
+                self._add("evidence", [
+                    (e["quote"], e.get("fetched_at") or now, e.get("url"), e.get("agent"), None,
+                     task_rows.get((e.get("agent"), e.get("url"))))
+                    for e in evidence
+                ])
+
+    def search(self, kind: str, text: str, k: int = 10, min_sim: float = 0.0, newer_than: float = 0.0) -> List[Tuple[int, float]]:
+        with self.lock:
+            matrix = self.vectors[kind].view()
+            times = self.times[kind]
+            start = int(np.searchsorted(self.added[kind], newer_than)) if newer_than else 0
+        if start >= len(matrix):
+            return []
+        sims = matrix[start:] @ embed(text, self.dim)
+        sims[times[start:] < newer_than] = -1.0
+        k = min(k, len(sims))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(start + int(i), float(sims[i])) for i in top if sims[i] >= min_sim]
+
+    def rows(self, kind: str, rows: Sequence[int]) -> List[Dict[str, Any]]:
+        if not rows:
+            return []
+        marks = ",".join("?" * len(rows))
+        with self.lock:
+            found = self.conn.execute(
+                f"SELECT row, created_at, text, url, agent, ref FROM items WHERE kind = ? AND row IN ({marks})",
+                (kind, *rows),
+            ).fetchall()
+        by_row = {r[0]: {"row": r[0], "created_at": r[1], "text": r[2], "url": r[3], "agent": r[4], "ref": r[5]} for r in found}
+        return [by_row[r] for r in rows if r in by_row]
+
+    def task_evidence(self, task_rows: Sequence[int], newer_than: float = 0.0) -> List[Dict[str, Any]]:
+        if not task_rows:
+            return []
+        marks = ",".join("?" * len(task_rows))
+        with self.lock:
+            found = self.conn.execute(
+                f"SELECT row, created_at, text, url, agent FROM items"
+                f" WHERE kind = 'evidence' AND task IN ({marks}) AND created_at >= ? ORDER BY row",
+                (*task_rows, newer_than),
+            ).fetchall()
+        return [{"row": r[0], "created_at": r[1], "text": r[2], "url": r[3], "agent": r[4]} for r in found]
+
+    def close(self):
+        with self.lock:
+            for vf in self.vectors.values():
+                vf.mm.flush()
+            self.conn.close()
@@ -0,0 +1,56 @@
+import asyncio
+import time
+from typing import Any, Dict, List
+
+from core.text import overlap, token_set
+
+
+class Speculation:
+    # Explorer work started on the planner's fallback tasks while the real planner
+    # call is still running. adopt() hands matching work over to the real plan and
+    # cancels the rest.
+    def __init__(self, explorer, prompt: str, tasks: List[Dict[str, str]]):
+        self.started_at = time.time()
+        self.items = []
+        for t in tasks:
+            fut = explorer.start(t["task"], t["tag"], prompt)
+            item = {"task": t, "tokens": token_set(t["task"]), "future": fut, "finished_at": None}
+            fut.add_done_callback(lambda _, item=item: item.__setitem__("finished_at", time.time()))
+            self.items.append(item)
+        self.stats: Dict[str, Any] = {"started": len(self.items), "reused": 0, "cancelled": 0, "hidden_s": 0.0}
+
+    def adopt(self, tasks: List[Dict[str, Any]], min_overlap: float) -> Dict[int, asyncio.Future]:
+        plan_at = time.time()
+        free = list(self.items)
+        prefetched = {}
+        hidden = 0.0
+
+        for i, t in enumerate(tasks):
+            tokens = token_set(t.get("task") or "")
+            best, best_score = None, min_overlap
+            for item in free:
+                if item["task"]["tag"] != t.get("tag"):
+                    continue
+                score = overlap(tokens, item["tokens"])
+                if score >= best_score:
+                    best, best_score = item, score
+            if best is None:
+                continue
+            free.remove(best)
+            prefetched[i] = best["future"]
+            # the part of this task's work that ran while we were waiting on the planner
+            hidden = max(hidden, (best["finished_at"] or plan_at) - self.started_at)
+
+        for item in free:
+            item["future"].cancel()
+
+        self.stats.update(
+            reused=len(prefetched),
+            cancelled=len(free),
+            hidden_s=round(hidden, 3),
+        )
+        return prefetched
+
+    def cancel(self):
+        for item in self.items:
+            item["future"].cancel()
@@ -0,0 +1,67 @@
+import math
+import re
+from collections import Counter
+from typing import List, Sequence, Set
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i in is it its me my of on or
+tell that the their them there these they this those to was we were what when where which
+who why will with about into over than then between you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def token_set(text: str) -> Set[str]:
+    return set(tokenize(text))
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def overlap(a: Set[str], b: Set[str]) -> float:
+    # share of the smaller set found in the larger one; tolerant of long vs short phrasings
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def coverage(query: Set[str], text: Set[str]) -> float:
+    # share of the query terms that the text mentions
+    if not query:
+        return 0.0
+    return len(query & text) / len(query)
+
+
+class BM25:
+    def __init__(self, docs: Sequence[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.tfs = [Counter(d) for d in docs]
+        self.lens = [len(d) for d in docs]
+        self.avg_len = (sum(self.lens) / len(self.lens)) if self.lens else 0.0
+        df = Counter()
+        for tf in self.tfs:
+            df.update(tf.keys())
+        n = len(self.tfs)
+        self.idf = {t: math.log(1 + (n - c + 0.5) / (c + 0.5)) for t, c in df.items()}
+
+    def scores(self, query: List[str]) -> List[float]:
+        terms = [t for t in set(query) if t in self.idf]
+        out = []
+        for tf, dl in zip(self.tfs, self.lens):
+            norm = self.k1 * (1 - self.b + self.b * dl / self.avg_len) if self.avg_len else self.k1
+            s = 0.0
+            for t in terms:
+                f = tf.get(t)
+                if f:
+                    s += self.idf[t] * f * (self.k1 + 1) / (f + norm)
+            out.append(s)
+        return out
@@ -1,22 +1,100 @@
+import asyncio
+import json
 import time
-from typing import Any, Dict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 
+from core import metrics
 from core.controller import ResearchController
+from core.jobs import JobQueue, QueueFull
 
-app = FastAPI(title="Research Agent API")
 controller = ResearchController()
+jobs = JobQueue(
+    controller,
+    workers=controller.settings.job_workers,
+    max_queue=controller.settings.job_max_queue,
+    retention_s=controller.settings.job_retention_s,
+    max_retained=controller.settings.job_max_retained,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # SDK clients and the semantic index load in the background; /health answers meanwhile
+    controller.warm_up()
+    jobs.start()
+    yield
+    await jobs.stop()
+    await controller.aclose()
+
+
+app = FastAPI(title="Research Agent API", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def trace_id(request: Request, call_next):
+    # every log line emitted while serving this request carries its trace id
+    tid = request.headers.get("x-request-id") or metrics.new_trace_id()
+    token = metrics.trace_id_var.set(tid)
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.trace_id_var.reset(token)
+    response.headers["X-Trace-Id"] = tid
+    return response
 
 
 class ResearchRequest(BaseModel):
     prompt: str
+    no_cache: bool = False
+    deadline_s: Optional[float] = Field(None, gt=0)  # overrides deadline.default_s
+
+
+class BatchRequest(BaseModel):
+    prompts: List[str] = Field(..., min_length=1)
+    no_cache: bool = False
+
+
+class RefreshRequest(BaseModel):
+    run_id: Optional[str] = None
+    prompt: Optional[str] = None  # refreshes the latest stored run of this prompt
+
+
+class JobRequest(ResearchRequest):
+    priority: int = Field(5, ge=0, le=9)  # 0 runs first
+
+
+def report_response(state: Dict[str, Any], t0: float) -> Dict[str, Any]:
+    out = {
+        "final_report": state.get("final_report", ""),
+        "took_seconds": round(time.time() - t0, 2),
+        "cached": state.get("cached", False),
+    }
+    if state.get("run_id"):
+        out["run_id"] = state["run_id"]
+    if state.get("deadline"):
+        out["degraded"] = state["deadline"].get("degraded", False)
+        out["cutoff_tasks"] = state["deadline"].get("cutoff_tasks", [])
+    return out
+
+
+def sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
 @app.get("/health")
 def health():
-    return {"ok": True}
+    # liveness only: the process is up even while the upstream clients are still loading
+    return {"ok": True, "ready": controller.ready}
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.post("/research")
@@ -27,11 +105,160 @@ async def research(req: ResearchRequest):
 
     t0 = time.time()
     try:
-        state = await controller.run_pipeline(prompt)
+        state = await controller.run_pipeline(prompt, use_cache=not req.no_cache, deadline_s=req.deadline_s)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return report_response(state, t0)
+
+
+@app.post("/research/batch")
+async def research_batch(req: BatchRequest):
+    prompts = [(p or "").strip() for p in req.prompts]
+    if not all(prompts):
+        raise HTTPException(status_code=400, detail="every prompt must be non-empty")
+    if len(prompts) > controller.settings.batch_max_prompts:
+        raise HTTPException(
+            status_code=400, detail=f"at most {controller.settings.batch_max_prompts} prompts per batch"
+        )
+
+    t0 = time.time()
+    try:
+        batch = await controller.run_batch(prompts, use_cache=not req.no_cache)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    results = []
+    for prompt, state in zip(prompts, batch["results"]):
+        item = {"prompt": prompt, "final_report": state.get("final_report", ""), "cached": state.get("cached", False)}
+        if state.get("run_id"):
+            item["run_id"] = state["run_id"]
+        if state.get("safety", {}).get("blocked"):
+            item["safety"] = state["safety"]
+        if state.get("error"):
+            item["error"] = state["error"]
+        item["evidence"] = len(state.get("evidence", []) or [])
+        results.append(item)
+    return {"results": results, "stats": batch["stats"], "took_seconds": round(time.time() - t0, 2)}
+
+
+@app.post("/research/refresh")
+async def research_refresh(req: RefreshRequest):
+    if not (req.run_id or (req.prompt or "").strip()):
+        raise HTTPException(status_code=400, detail="run_id or prompt is required")
+    run_store()
+
+    t0 = time.time()
+    try:
+        state = await controller.refresh_pipeline(run_id=req.run_id, prompt=(req.prompt or "").strip())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if state is None:
+        raise HTTPException(status_code=404, detail="run not found")
+
+    return {**report_response(state, t0), "refresh": state["refresh"]}
+
+
+@app.post("/research/stream")
+async def research_stream(req: ResearchRequest):
+    prompt = (req.prompt or "").strip()
+    if not prompt:
+        raise HTTPException(status_code=400, detail="prompt is required")
+
+    async def events():
+        t0 = time.time()
+        try:
+            async for event, payload in controller.stream_pipeline(
+                prompt, use_cache=not req.no_cache, deadline_s=req.deadline_s
+            ):
+                if event == "done":
+                    payload = {**report_response(payload, t0), "timings": payload.get("timings", {})}
+                    payload["trace_id"] = metrics.trace_id_var.get()
+                elif event == "blocked":
+                    payload = {**report_response(payload, t0), "safety": payload.get("safety", {})}
+                yield sse(event, payload)
+        except Exception as e:
+            yield sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(req: JobRequest):
+    prompt = (req.prompt or "").strip()
+    if not prompt:
+        raise HTTPException(status_code=400, detail="prompt is required")
+
+    try:
+        job = jobs.submit(prompt, priority=req.priority, use_cache=not req.no_cache, deadline_s=req.deadline_s)
+    except QueueFull as e:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": str(e)},
+            headers={"Retry-After": str(e.retry_after_s)},
+        )
+    return {"id": job.id, "status": job.status, "queue_depth": jobs.queue.qsize()}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job.view()
+
+
+def run_store():
+    if controller.run_store is None:
+        raise HTTPException(status_code=404, detail="run store is disabled")
+    return controller.run_store
+
+
+def similar_runs(text: str, limit: int):
+    # past prompts ranked by similarity to `text`, from the local semantic index
+    if controller.index is None:
+        return []
+    hits = controller.index.search("prompt", text, k=limit, min_sim=0.2)
+    rows = controller.index.rows("prompt", [row for row, _ in hits])
+    sims = dict(hits)
+    return [
+        {"id": r["ref"], "prompt": r["text"], "created_at": r["created_at"], "similarity": round(sims[r["row"]], 3)}
+        for r in rows if r["ref"]
+    ]
+
+
+@app.get("/runs")
+async def list_runs(
+    limit: int = Query(20, ge=1, le=200),
+    cursor: Optional[str] = None,
+    prompt: Optional[str] = None,
+    url: Optional[str] = None,
+    since: Optional[float] = None,
+    similar: Optional[str] = None,
+):
+    store = run_store()
+    if similar:
+        await controller.wait_ready()
+        return {"runs": await asyncio.to_thread(similar_runs, similar, limit), "next_cursor": None}
+    try:
+        return await asyncio.to_thread(store.list, limit, cursor, prompt, url, since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
 
-    return {
-            "final_report": state.get("final_report", ""),
-            "took_seconds": round(time.time() - t0, 2),
-        }
\ No newline at end of file
+@app.get("/runs/{run_id}")
+async def get_run(
+    run_id: str,
+    evidence_limit: int = Query(50, ge=0, le=1000),
+    evidence_offset: int = Query(0, ge=0),
+):
+    run = await asyncio.to_thread(run_store().get, run_id, evidence_limit, evidence_offset)
+    if run is None:
+        raise HTTPException(status_code=404, detail="run not found")
+    return run